@@ -0,0 +1,953 @@
+"""Benchmarks for the game states and search engines
+
+Run this module to time every benchmark, or name the ones to run.
+Results are written as JSON, and compared against a baseline saved by
+an earlier run with --save-baseline. Any result that is worse than the
+baseline by more than the tolerance is reported, and the run exits
+with an error.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+from disk_cache import DiskCache, persist
+from engine import (DumbComputer, GameState, Player, SearchStats,
+    SmartComputer)
+from export import export, read_chunk, solved_positions
+import game_engin
+from game_log import GameLogWriter, read_games
+from games import GAMES
+from mcts import MCTSComputer
+import min_tac_toe
+from mnk import MNKGrid, lines
+from move_order import HeuristicOrdering, MoveOrdering
+from search_cache import GAME, PROCESS, TranspositionTable
+from selfplay import play_headless, self_play
+from sim_nim import (ComputerNimGrundy, ComputerNimSolved, Heaps, Pot,
+    grundy_values, solve_pot)
+from solved_table import TableComputer, build, solve
+from symmetry import canonical_bits
+from ttt_engin import TicTacToe_WINNING_COMBOS, TicTacToeGrid
+from zobrist import board_keys, smallest_key
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, float]]] = {}
+# Results named with these endings are better when higher
+HIGHER = ('_per_s', '_speedup', '_win_rate')
+# and these are counts that describe the run, and aren't compared
+NEUTRAL = ('_nodes', '_positions', 'positions_stored', 'stored_bytes',
+    'cpu_count')
+# The most milliseconds a headless self-play may take to start and run
+STARTUP_BUDGET_MS = 50
+
+def benchmark(function: Callable[[], Dict[str, float]]):
+    """Registers a benchmark. It returns a dict of named results, each
+    better when higher or lower, or not compared, by the ending of its
+    name; see HIGHER and NEUTRAL. All others are better when lower."""
+    BENCHMARKS[function.__name__] = function
+    return function
+
+def direction(metric: str) -> int:
+    """1 if the result is better when higher, -1 if when lower, and 0
+    if it isn't compared"""
+    if metric.endswith(NEUTRAL):
+        return 0
+    return 1 if metric.endswith(HIGHER) else -1
+
+
+@dataclass(frozen=True)
+class StringTicTacToeGrid(GameState):
+    """The original string backed grid, kept as a point of comparison"""
+
+    matrix: str = ' ' * 9
+    players: Tuple[Player, Player] = ()
+
+    @property
+    def potential_moves(self) -> List:
+        return [(row, col) for row in range(3) for col in range(3)]
+
+    def is_legal(self, position: Tuple[int,int]) -> bool:
+        row, col = position
+        return self.matrix[row * 3 + col] == ' '
+
+    def move(self, position: Tuple[int,int]) -> 'StringTicTacToeGrid':
+        row, col = position
+        index = row * 3 + col
+        if self.matrix[index] == ' ':
+            x_count = self.matrix.count('X')
+            o_count = self.matrix.count('O')
+            mark = ('X' if x_count == o_count else 'O')
+            new_matrix = self.matrix[:index] + mark + self.matrix[index + 1:]
+            return StringTicTacToeGrid(new_matrix, self.next_players)
+        else:
+            raise ValueError
+
+    @cached_property
+    def won(self) -> bool:
+        for combo in TicTacToe_WINNING_COMBOS:
+            if (self.matrix[combo[0][0] * 3 + combo[0][1]]
+             == self.matrix[combo[1][0] * 3 + combo[1][1]]
+             == self.matrix[combo[2][0] * 3 + combo[2][1]]
+             != ' '):
+                return True
+        return False
+
+
+class EagerTicTacToeGrid(TicTacToeGrid):
+    """The bitboard grid with moves generated the way they were before
+    they were made lazily: every child is made up front by trying each
+    square and catching the ValueError, and tie and the winning moves
+    are found from the whole list"""
+
+    def move(self, position: Tuple[int,int]) -> 'EagerTicTacToeGrid':
+        grid = TicTacToeGrid.move(self, position)
+        return EagerTicTacToeGrid(grid.x, grid.o, grid.players)
+
+    @property
+    def children(self) -> Iterator[Tuple[Tuple[int, int], GameState]]:
+        moves = []
+        for move in self.potential_moves:
+            try:
+                moves.append((move, self.move(move)))
+            except ValueError:
+                continue
+        return iter(moves)
+
+    @property
+    def legal_moves(self) -> Iterator[Tuple[int, int]]:
+        return (move for move, next_state in self.children)
+
+    winning_moves = GameState.winning_moves
+
+    @property
+    def tie(self) -> bool:
+        if self.won:
+            return False
+        elif [*self.possible_moves] == []:
+            return True
+        else:
+            return False
+
+
+@dataclass(frozen=True)
+class UnslottedTicTacToeGrid(GameState):
+    """The bitboard grid the way it was before it had slots: each grid
+    has a __dict__ to cache won and its cache_key in, is hashed from its
+    fields every time, and makes a new pair of players for each move"""
+
+    x: int = 0
+    o: int = 0
+    players: Tuple[Player, Player] = ()
+
+    potential_moves = TicTacToeGrid.potential_moves
+    is_legal = TicTacToeGrid.is_legal
+
+    @property
+    def next_players(self) -> Tuple[Player, Player]:
+        return self.players[1], self.players[0]
+
+    def move(self, position: Tuple[int,int]) -> 'UnslottedTicTacToeGrid':
+        if not self.is_legal(position):
+            raise ValueError
+        bit = 1 << (position[0] * 3 + position[1])
+        if self.x.bit_count() == self.o.bit_count():
+            return UnslottedTicTacToeGrid(self.x | bit, self.o,
+                self.next_players)
+        else:
+            return UnslottedTicTacToeGrid(self.x, self.o | bit,
+                self.next_players)
+
+    @cached_property
+    def won(self) -> bool:
+        return TicTacToeGrid._find_win(self)
+
+    @cached_property
+    def cache_key(self) -> int:
+        return smallest_key(board_keys((self.x, self.o), 3))
+
+
+def walk(game: GameState) -> int:
+    """Visits every node of the game tree below game, without any
+    caching, and returns the number of nodes visited"""
+    if game.won:
+        return 1
+    children = game.possible_moves
+    return 1 + sum(walk(next_state) for move, next_state in children)
+
+def best_time(function: Callable[[], object], repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def per_call(function: Callable[[], object], number: int = 10_000) -> float:
+    """Returns the seconds taken by one call, best of five runs"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+def uncached(cls: type, name: str) -> Callable:
+    """Returns the function behind a property, cached_property or slot,
+    so that it can be timed without hitting the cache"""
+    attribute = getattr(cls, name)
+    if isinstance(attribute, cached_property):
+        return attribute.func
+    if isinstance(attribute, property):
+        return attribute.fget
+    # Slotted states work out whether they are won as they are made
+    return getattr(cls, '_find_win')
+
+
+@benchmark
+def grid_walk() -> Dict[str, float]:
+    """Nodes/sec walking the tree after a first move in the center, for
+    the bitboard grid and the original string grid"""
+    players = (DumbComputer('X'), DumbComputer('O'))
+    results = {}
+    for name, grid_class in (
+        ('string', StringTicTacToeGrid), ('bitboard', TicTacToeGrid)):
+        grid = grid_class(players=players).move((1, 1))
+        start = time.perf_counter()
+        nodes = walk(grid)
+        results[f'{name}_nodes_per_s'] = nodes / (time.perf_counter() - start)
+    return results
+
+
+@dataclass
+class SearchEngine:
+    """The hooks the search benchmarks need from each engine"""
+
+    new_game: Callable[[], GameState]
+    first_move: Callable[[GameState], object]
+    clear: Callable[[], None]
+    nodes: Callable[[], int]
+
+def search_engines() -> Dict[str, SearchEngine]:
+    players = (SmartComputer('X'), SmartComputer('O'))
+    player = players[0]
+    ttt_player = game_engin.SmartComputer()
+    return {
+        'engine': SearchEngine(
+            new_game=lambda: TicTacToeGrid(players=players),
+            first_move=player.inteligent_moves,
+            clear=player.table.clear,
+            nodes=lambda: player.table.misses,
+        ),
+        'game_engin': SearchEngine(
+            new_game=min_tac_toe.TicTacToeGrid,
+            first_move=ttt_player.inteligent_moves,
+            clear=ttt_player.minimax.cache_clear,
+            nodes=lambda: ttt_player.minimax.cache_info().misses,
+        ),
+        'min_tac_toe': SearchEngine(
+            new_game=min_tac_toe.TicTacToeGrid,
+            first_move=min_tac_toe.good_move,
+            clear=min_tac_toe._minimax.cache_clear,
+            nodes=lambda: min_tac_toe._minimax.cache_info().misses,
+        ),
+    }
+
+def measure_search(search: SearchEngine) -> Dict[str, float]:
+    def cold():
+        search.clear()
+        search.first_move(search.new_game())
+    cold_time = best_time(cold)
+    nodes = search.nodes()
+    warm_time = per_call(
+        lambda: search.first_move(search.new_game()), number=1000)
+    search.clear()
+    tracemalloc.start()
+    search.first_move(search.new_game())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    search.clear()
+    return {
+        'first_move_cold_s': cold_time,
+        'first_move_warm_s': warm_time,
+        'nodes': nodes,
+        'nodes_per_s': nodes / cold_time,
+        'peak_cache_bytes': peak,
+    }
+
+@benchmark
+def search() -> Dict[str, float]:
+    """The time each engine takes to choose a first move on an empty
+    3x3 grid, with an empty cache and again with a full one"""
+    return {
+        f'{name}_{metric}': value
+        for name, search in search_engines().items()
+        for metric, value in measure_search(search).items()
+    }
+
+
+@benchmark
+def instrumentation() -> Dict[str, float]:
+    """Cold first move time for SmartComputer with and without stats"""
+    results = {}
+    for name, stats in (('plain', None), ('instrumented', SearchStats())):
+        players = (SmartComputer('X', stats=stats), SmartComputer('O'))
+        player = players[0]
+        def cold():
+            player.table.clear()
+            player.inteligent_moves(TicTacToeGrid(players=players))
+        results[f'{name}_first_move_s'] = best_time(cold)
+    results['overhead'] = (results['instrumented_first_move_s']
+        / results['plain_first_move_s'])
+    return results
+
+
+@benchmark
+def move_ordering() -> Dict[str, float]:
+    """Nodes searched to choose a first move on an empty 3x3 grid, with
+    moves searched in the order listed and with heuristic ordering"""
+    results = {}
+    for name, ordering in (
+        ('listed', MoveOrdering), ('heuristic', HeuristicOrdering)):
+        players = (SmartComputer('X', ordering=ordering()), SmartComputer('O'))
+        player = players[0]
+        player.inteligent_moves(TicTacToeGrid(players=players))
+        results[f'engine_{name}_nodes'] = player.table.misses
+
+        ttt_player = game_engin.SmartComputer(ordering=ordering())
+        ttt_player.inteligent_moves(min_tac_toe.TicTacToeGrid())
+        results[f'game_engin_{name}_nodes'] = (
+            ttt_player.minimax.cache_info().misses)
+    return results
+
+
+@benchmark
+def lazy_moves() -> Dict[str, float]:
+    """States made, and ValueErrors raised by illegal moves, while
+    choosing a first move on an empty 3x3 grid, with children made as
+    the search reaches them and with every child made up front"""
+    counts = {'states': 0, 'exceptions': 0}
+    move = TicTacToeGrid.move
+
+    def counted_move(self, position):
+        try:
+            next_state = move(self, position)
+        except ValueError:
+            counts['exceptions'] += 1
+            raise
+        counts['states'] += 1
+        return next_state
+
+    results = {}
+    TicTacToeGrid.move = counted_move
+    try:
+        for name, grid_class in (
+            ('lazy', TicTacToeGrid), ('eager', EagerTicTacToeGrid)):
+            # A search first, so that tables built once aren't counted
+            players = (SmartComputer('X'), SmartComputer('O'))
+            players[0].inteligent_moves(grid_class(players=players))
+            players = (SmartComputer('X'), SmartComputer('O'))
+            counts.update(states=0, exceptions=0)
+            tracemalloc.start()
+            start = time.perf_counter()
+            players[0].inteligent_moves(grid_class(players=players))
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[f'{name}_states'] = counts['states']
+            results[f'{name}_exceptions'] = counts['exceptions']
+            results[f'{name}_peak_bytes'] = peak
+            results[f'{name}_first_move_s'] = seconds
+    finally:
+        TicTacToeGrid.move = move
+    return results
+
+
+@benchmark
+def grid_operations() -> Dict[str, float]:
+    """Time to generate the moves from, and check for a win on, a
+    position from the middle of a game"""
+    players = (DumbComputer('X'), DumbComputer('O'))
+    matrix = 'XO  X  O '
+    grids = {
+        'bitboard': TicTacToeGrid.from_matrix(matrix, players),
+        'string': StringTicTacToeGrid(matrix, players),
+        'min_tac_toe': min_tac_toe.TicTacToeGrid(matrix),
+    }
+    results = {}
+    for name, grid in grids.items():
+        grid_class = type(grid)
+        possible_moves = uncached(grid_class, 'possible_moves')
+        won = uncached(grid_class, 'won')
+        results[f'{name}_movegen_s'] = per_call(lambda: possible_moves(grid))
+        results[f'{name}_wincheck_s'] = per_call(lambda: won(grid))
+    return results
+
+
+@benchmark
+def mnk_win_check() -> Dict[str, float]:
+    """Time to check a 15x15 gomoku board for a win, looking only
+    through the last move and scanning every line"""
+    grid = MNKGrid(15, 15, 5, players=(DumbComputer('X'), DumbComputer('O')))
+    for position in ((7, 7), (7, 8), (8, 8), (6, 6), (8, 7), (9, 9)):
+        grid = grid.move(position)
+    masks = lines(15, 15, 5)
+    won = uncached(MNKGrid, 'won')
+    return {
+        'last_move_s': per_call(lambda: won(grid)),
+        'all_lines_s': per_call(
+            lambda: any(grid.x & mask == mask for mask in masks)),
+    }
+
+
+@benchmark
+def state_memory() -> Dict[str, float]:
+    """Bytes taken by each state, holding every reachable 3x3 grid with
+    won and cache_key looked at, for the slotted grid and one without
+    slots. Also the time to make them all, and to look each one up."""
+    results = {}
+    for name, grid_class in (
+        ('slotted', TicTacToeGrid), ('unslotted', UnslottedTicTacToeGrid)):
+        players = (DumbComputer('X'), DumbComputer('O'))
+        tracemalloc.start()
+        start = time.perf_counter()
+        states = {grid_class(players=players): None}
+        layer = list(states)
+        while layer:
+            next_layer = []
+            for state in layer:
+                state.cache_key
+                if state.won:
+                    continue
+                for move, next_state in state.children:
+                    if next_state not in states:
+                        states[next_state] = None
+                        next_layer.append(next_state)
+            layer = next_layer
+        seconds = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(states) == 5478, len(states)
+        results[f'{name}_bytes_per_state'] = size / len(states)
+        results[f'{name}_build_s'] = seconds
+        results[f'{name}_lookup_s'] = best_time(
+            lambda: all(state in states for state in states))
+        del states, layer
+    return results
+
+
+@benchmark
+def zobrist_keys() -> Dict[str, float]:
+    """Time per node to find a child's cache key and look it up, with
+    Zobrist keys updated from the parent's and with keys made from the
+    whole board, on 3x3 and 7x7 boards. Boards of more than 16 squares
+    used to be keyed as they were, without finding their symmetric
+    form, which is timed too. Also the first move on a 4x4 board, won
+    by 3 in a row, searched with the table checking for collisions."""
+    random.seed(0)
+    results = {}
+    for size in (3, 7):
+        players = (DumbComputer('X'), DumbComputer('O'))
+        tables = MNKGrid(size, size, size).key_tables
+        nodes = []
+        while len(nodes) < 2000:
+            grid = MNKGrid(size, size, size, players=players)
+            while not grid.won and grid.has_moves:
+                move = random.choice(list(grid.legal_moves))
+                child = grid.move(move)
+                nodes.append((grid, move[0] * size + move[1],
+                    0 if child.x != grid.x else 1, child))
+                grid = child
+        zobrist_table = {
+            (smallest_key(grid.keys ^ tables[square][mark]), True): None
+            for grid, square, mark, child in nodes
+        }
+        board_table = {
+            (child.exact_key, True): None
+            for grid, square, mark, child in nodes
+        }
+        as_is_table = {
+            (size, size, size, child.x, child.o, True): None
+            for grid, square, mark, child in nodes
+        }
+        results[f'{size}x{size}_zobrist_node_s'] = best_time(lambda: [
+            (smallest_key(grid.keys ^ tables[square][mark]), True)
+            in zobrist_table
+            for grid, square, mark, child in nodes
+        ]) / len(nodes)
+        results[f'{size}x{size}_symmetric_board_node_s'] = best_time(lambda: [
+            ((size, size, size) + canonical_bits(
+                (child.x, child.o), size, size)[0], True) in board_table
+            for grid, square, mark, child in nodes
+        ]) / len(nodes)
+        results[f'{size}x{size}_board_as_is_node_s'] = best_time(lambda: [
+            (size, size, size, child.x, child.o, True) in as_is_table
+            for grid, square, mark, child in nodes
+        ]) / len(nodes)
+    players = (SmartComputer('X', table=TranspositionTable(debug=True)),
+        SmartComputer('O'))
+    start = time.perf_counter()
+    players[0].inteligent_moves(MNKGrid(4, 4, 3, players=players))
+    results['mnk_4_4_3_debug_first_move_s'] = time.perf_counter() - start
+    results['mnk_4_4_3_nodes'] = len(players[0].table)
+    return results
+
+
+@benchmark
+def cache_policy() -> Dict[str, float]:
+    """One player choosing first moves in a run of different games
+    twice over, as a long running worker would, with its table kept
+    for the process, bounded to 2,000 positions, and scoped to each
+    game. Reports the positions and bytes held at the end, the most
+    bytes held at any point, and the time taken. Also the same for
+    game_engin.SmartComputer choosing a first move on a 3x3 grid."""
+    games = [
+        lambda players: TicTacToeGrid(players=players),
+        lambda players: MNKGrid(4, 3, 3, players=players),
+        lambda players: Pot(40, players),
+        lambda players: Pot(40, players, (1, 3, 4)),
+        lambda players: MNKGrid(3, 4, 3, players=players),
+    ]
+    results = {}
+    for name, maxsize, scope in (('process', None, PROCESS),
+        ('bounded', 2000, PROCESS), ('game', None, GAME)):
+        players = (SmartComputer('X',
+            table=TranspositionTable(maxsize, scope=scope)),
+            SmartComputer('O'))
+        most_bytes = 0
+        seconds = 0.0
+        for new_game in games * 2:
+            game = new_game(players)
+            start = time.perf_counter()
+            players[0].new_game(game)
+            players[0].inteligent_moves(game)
+            seconds += time.perf_counter() - start
+            most_bytes = max(most_bytes, players[0].table.nbytes)
+        results[f'{name}_positions'] = len(players[0].table)
+        results[f'{name}_bytes'] = players[0].table.nbytes
+        results[f'{name}_most_bytes'] = most_bytes
+        results[f'{name}_s'] = seconds
+    for name, maxsize in (('unbounded', None), ('bounded', 500)):
+        ttt_player = game_engin.SmartComputer(maxsize=maxsize)
+        start = time.perf_counter()
+        ttt_player.inteligent_moves(min_tac_toe.TicTacToeGrid())
+        results[f'game_engin_{name}_s'] = time.perf_counter() - start
+        results[f'game_engin_{name}_nodes'] = (
+            ttt_player.minimax.cache_info().misses)
+        results[f'game_engin_{name}_bytes'] = ttt_player.minimax.nbytes
+    return results
+
+
+@benchmark
+def game_log() -> Dict[str, float]:
+    """Games/sec writing random games to a game log and reading them
+    back, streamed and through a memory map, and rebuilding their
+    states, for 3x3 tic-tac-toe and 7x7 boards won by 4 in a row.
+    Also the bytes the log takes for each move."""
+    random.seed(0)
+    players = (DumbComputer('X'), DumbComputer('O'))
+    results = {}
+    for name, start, count in (
+        ('ttt', TicTacToeGrid(players=players), 20_000),
+        ('mnk_7x7x4', MNKGrid(7, 7, 4, players=players), 2_000)):
+        played = []
+        for _ in range(count):
+            moves = []
+            play_headless(start, lambda *move: moves.append(move))
+            played.append(moves)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'games.log')
+
+            def write():
+                with GameLogWriter(path) as writer:
+                    for seed, moves in enumerate(played):
+                        writer.start(start, seed)
+                        for move in moves:
+                            writer.on_move(*move)
+
+            write_s = time.perf_counter()
+            write()
+            write_s = time.perf_counter() - write_s
+            size = os.path.getsize(path)
+            stream_s = best_time(lambda: [
+                record.moves for record in read_games(path)], repeat=3)
+            mmap_s = best_time(lambda: [
+                record.moves for record in read_games(path, use_mmap=True)],
+                repeat=3)
+            replay_s = time.perf_counter()
+            replayed = [
+                [(state.x, state.o) for state in record.states()][1:]
+                for record in read_games(path)
+            ]
+            replay_s = time.perf_counter() - replay_s
+        assert replayed == [
+            [(state.x, state.o) for player, move, state in moves]
+            for moves in played
+        ]
+        results[f'{name}_write_games_per_s'] = count / write_s
+        results[f'{name}_stream_read_games_per_s'] = count / stream_s
+        results[f'{name}_mmap_read_games_per_s'] = count / mmap_s
+        results[f'{name}_replay_games_per_s'] = count / replay_s
+        results[f'{name}_bytes_per_move'] = size / sum(map(len, played))
+    return results
+
+
+@benchmark
+def dataset_export() -> Dict[str, float]:
+    """Positions/sec exporting every 3x3 tic-tac-toe position, checked
+    against solved_table.solve, and the bytes each takes. Also the peak
+    memory of the export with small sort runs and chunks, against that
+    of solve, and positions/sec solving every 4x3 position won by 3 in
+    a row."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        paths = export(TicTacToeGrid(), directory)
+        seconds = time.perf_counter() - start
+        exported = [record for path in paths for record in read_chunk(path)]
+        size = sum(map(os.path.getsize, paths))
+    solved = solve()
+    assert len(exported) == len(solved)
+    assert all(solved[x, o] == (value, best)
+        for x, o, value, best in exported)
+    results['ttt_positions_per_s'] = len(exported) / seconds
+    results['ttt_bytes_per_position'] = size / len(exported)
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        export(TicTacToeGrid(), directory, chunk_size=1024, sort_size=256)
+        results['ttt_export_peak_kb'] = (
+            tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    tracemalloc.start()
+    solve()
+    results['ttt_solve_peak_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    count = sum(1 for _ in solved_positions(MNKGrid(4, 3, 3)))
+    results['mnk_4x3x3_positions_per_s'] = (
+        count / (time.perf_counter() - start))
+    return results
+
+
+@benchmark
+def reentrancy() -> Dict[str, float]:
+    """Games/sec playing 1,000 games side by side on a thread pool, a
+    move at a time, so the moves of different games interleave. That
+    they don't disturb each other is tested in test_engine."""
+    # The table is mapped as the players are made, so it can be deleted
+    # once they have been
+    with tempfile.TemporaryDirectory() as directory:
+        table = os.path.join(directory, 'ttt_solved.bin')
+        build(table)
+        games = []
+        for n in range(1000):
+            names = (f'{n}a', f'{n}b')
+            if n % 3 == 0:
+                players = (TableComputer(names[0], table_path=table),
+                    TableComputer(names[1], table_path=table))
+                games.append(TicTacToeGrid(players=players))
+            elif n % 3 == 1:
+                players = (DumbComputer(names[0]),
+                    TableComputer(names[1], table_path=table))
+                games.append(TicTacToeGrid(players=players))
+            else:
+                players = (SmartComputer(names[0]), SmartComputer(names[1]))
+                games.append(Pot(n % 20 + 1, players))
+
+    def play_move(n: int) -> None:
+        game = games[n]
+        games[n] = game.move(
+            random.choice(game.current_player.inteligent_moves(game)))
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            playing = range(len(games))
+            while playing:
+                [*pool.map(play_move, playing)]
+                playing = [
+                    n for n in playing
+                    if not games[n].won and not games[n].tie
+                ]
+    finally:
+        sys.setswitchinterval(interval)
+    seconds = time.perf_counter() - start
+    return {'games_per_s': len(games) / seconds}
+
+
+@benchmark
+def parallel_search() -> Dict[str, float]:
+    """Time for SmartComputer to choose a move on 4x4 m,n,k boards and
+    partway through a 5x5 game won by 4 in a row, searching the root moves on 1, 2, 4 and 8 worker processes, and
+    the speedup over searching them in this process, which depends on
+    the cpu_count reported with them. Raises an AssertionError unless
+    every split search finds the serial search's best score and best
+    moves."""
+    positions = {
+        '4x4x3': (MNKGrid(4, 4, 3), ()),
+        '4x4x4': (MNKGrid(4, 4, 4), ((1, 1), (1, 2))),
+        '5x5x4': (MNKGrid(5, 5, 4), ((2, 2), (2, 3), (1, 2), (3, 2),
+            (1, 1), (3, 3), (0, 4), (1, 3), (3, 1), (4, 0))),
+    }
+    results = {'cpu_count': os.cpu_count() or 1}
+    for name, (board, moves) in positions.items():
+        best = {}
+        for workers in (1, 2, 4, 8):
+            players = (SmartComputer('X', workers=workers),
+                SmartComputer('O'))
+            grid = MNKGrid(board.width, board.height, board.k,
+                players=players)
+            for position in moves:
+                grid = grid.move(position)
+            player = grid.current_player
+            try:
+                start = time.perf_counter()
+                chosen = player.inteligent_moves(grid)
+                results[f'{name}_workers_{workers}_s'] = (
+                    time.perf_counter() - start)
+                # Only the best scores are exact, the rest are bounds
+                root_moves = list(grid.legal_moves)
+                if workers == 1:
+                    scores = {
+                        move: player.minimax(grid.move(move), my_turn=False)
+                        for move in root_moves
+                    }
+                else:
+                    by_key = player.split_search(grid, root_moves)
+                    scores = {
+                        move: by_key[grid.move(move).cache_key]
+                        for move in root_moves
+                    }
+            finally:
+                player.close()
+            top = max(scores.values())
+            best[workers] = (top, sorted(chosen), sorted(
+                move for move, score in scores.items() if score == top))
+        assert all(found == best[1] for found in best.values()), (
+            f'{name}: split searches disagree with the serial one')
+        for workers in (2, 4, 8):
+            results[f'{name}_workers_{workers}_speedup'] = (
+                results[f'{name}_workers_1_s']
+                / results[f'{name}_workers_{workers}_s'])
+    return results
+
+
+@benchmark
+def mcts() -> Dict[str, float]:
+    """Playouts/sec for MCTSComputer choosing a first move on 3x3 and on
+    a 7x7 board with four in a row to win, and how it fares over 20
+    games of 3x3 against SmartComputer, taking turns going first.
+    SmartComputer plays perfectly, so a tie is the best it can do."""
+    results = {}
+    for name, new_board, options in (
+        ('ttt', TicTacToeGrid, {'playouts': 5000}),
+        ('mnk_7x7x4', lambda players: MNKGrid(7, 7, 4, players=players,
+            reach=1), {'playouts': None, 'time_limit': 1.0}),
+    ):
+        player = MCTSComputer('M', **options)
+        players = (player, SmartComputer('S'))
+        player.inteligent_moves(new_board(players=players))
+        results[f'{name}_playouts_per_s'] = (
+            player.tree.playouts / player.tree.seconds)
+
+    wins = losses = games = 0
+    for seat in (0, 1):
+        players = [SmartComputer('S')]
+        players.insert(seat, MCTSComputer('M', playouts=500))
+        played = self_play(TicTacToeGrid(players=tuple(players)),
+            games=10, workers=1, seed=seat)
+        wins += played.wins[seat]
+        losses += played.losses[seat]
+        games += played.games
+    results['vs_smart_win_rate'] = wins / games
+    results['vs_smart_loss_rate'] = losses / games
+    return results
+
+
+@benchmark
+def nim_retrograde() -> Dict[str, float]:
+    """Time to solve Nim bottom up and to fill a table of every pot up
+    to ten million tokens, the bytes kept to look pots up, and the time
+    to choose a move from a pot of a million tokens"""
+    solve = solve_pot.__wrapped__
+    values = solve((1, 2, 3))
+    players = (ComputerNimSolved('A'), ComputerNimSolved('B'))
+    pot = Pot(1_000_000, players)
+    return {
+        'solve_s': per_call(lambda: solve((1, 2, 3)), number=1000),
+        'solve_3_4_7_s': per_call(lambda: solve((3, 4, 7)), number=1000),
+        'table_10m_s': best_time(lambda: values.table(10_000_000)),
+        'stored_bytes': len(values.values),
+        'move_1m_s': per_call(lambda: players[0].inteligent_moves(pot)),
+    }
+
+
+@benchmark
+def multi_heap_nim() -> Dict[str, float]:
+    """Times ComputerNimGrundy's moves in games of 1,000 heaps of up to
+    a million tokens. That its moves are right is tested in
+    test_engine."""
+    rng = random.Random(0)
+    counts = tuple(rng.randrange(1_000_000) for _ in range(1000))
+    player = ComputerNimGrundy('G')
+    results = {}
+    for name, takes in (
+        ('nim', None), ('takes_1_2_3', (1, 2, 3)),
+        ('takes_3_5_8_13', (3, 5, 8, 13))):
+        heaps = Heaps(counts, (player, ComputerNimGrundy('H')), takes)
+        results[f'{name}_1000_heaps_move_s'] = per_call(
+            lambda: player.inteligent_moves(heaps), number=100)
+    results['grundy_3_5_8_13_solve_s'] = per_call(
+        lambda: grundy_values.__wrapped__((3, 5, 8, 13)), number=100)
+    return results
+
+
+@benchmark
+def disk_cache() -> Dict[str, float]:
+    """First move times with a cache on disk that starts empty, and
+    again from fresh players and connections, as a restarted process
+    would have, for SmartComputer on 4x4 three in a row and for the
+    game_engin search on 3x3"""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.db')
+        for run in ('cold', 'warm'):
+            with DiskCache(path, 'mnk_4_4_3') as disk:
+                players = (SmartComputer('X',
+                    table=TranspositionTable(backend=disk)),
+                    SmartComputer('O'))
+                start = time.perf_counter()
+                players[0].inteligent_moves(MNKGrid(4, 4, 3, players=players))
+                results[f'engine_{run}_first_move_s'] = (
+                    time.perf_counter() - start)
+        with DiskCache(path, 'mnk_4_4_3') as disk:
+            results['engine_positions_stored'] = len(disk)
+
+        for run in ('cold', 'warm'):
+            with DiskCache(path, 'game_engin') as disk:
+                ttt_player = game_engin.SmartComputer()
+                persist(ttt_player, 'minimax', disk)
+                start = time.perf_counter()
+                ttt_player.inteligent_moves(min_tac_toe.TicTacToeGrid())
+                results[f'game_engin_{run}_first_move_s'] = (
+                    time.perf_counter() - start)
+    return results
+
+
+@benchmark
+def startup() -> Dict[str, float]:
+    """Milliseconds for the interpreter to start and stop, for python -m
+    cli --help, and for a one game headless self-play of each game in
+    games.GAMES with its default options, dumb against dumb, best of
+    twenty runs each. Raises an AssertionError if a self-play takes
+    STARTUP_BUDGET_MS or more, or loads Tkinter, the solved table, the
+    server, dataclasses or typing."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Bytecode is cached as it would be in use, so modules are only
+    # compiled on the first run
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    runs = [('interpreter', ['-c', 'pass']), ('help', ['-m', 'cli', '--help'])]
+    self_plays = {
+        game: ['self-play', game, '--games', '1', '--workers', '1',
+            '--x', 'dumb', '--o', 'dumb']
+        for game in GAMES
+    }
+    runs += [
+        (f'{game}_self_play', ['-m', 'cli', *args])
+        for game, args in self_plays.items()
+    ]
+    results = {}
+    for name, args in runs:
+        results[f'{name}_ms'] = 1000 * best_time(lambda: subprocess.run(
+            [sys.executable, *args], cwd=here, env=env, check=True,
+            stdout=subprocess.DEVNULL), repeat=20)
+    for game, args in self_plays.items():
+        loaded = subprocess.run([sys.executable, '-c',
+            f'import sys, cli; cli.main({args!r}); print(*sys.modules)'],
+            cwd=here, env=env, check=True, capture_output=True,
+            text=True).stdout.split()
+        heavy = {'tkinter', 'tk_tac_toe', 'solved_table', 'server',
+            'multiprocessing', 'dataclasses', 'typing'} & set(loaded)
+        assert not heavy, f"Self-play of {game} loaded {', '.join(heavy)}"
+        took = results[f'{game}_self_play_ms']
+        assert took < STARTUP_BUDGET_MS, (f'Self-play of {game} took '
+            f'{took:.1f} ms to start, over the {STARTUP_BUDGET_MS} ms budget')
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Returns a description of each result that has fallen behind the
+    baseline by more than the tolerance, as a fraction"""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            if metric not in baseline.get(name, {}):
+                continue
+            before = baseline[name][metric]
+            better = direction(metric)
+            if better > 0:
+                worse = value < before * (1 - tolerance)
+            elif better < 0:
+                worse = value > before * (1 + tolerance)
+            else:
+                worse = False
+            if worse:
+                regressions.append(
+                    f'{name}.{metric}: {value:.6g} (baseline {before:.6g})')
+    return regressions
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*',
+        help=f"benchmarks to run, from {', '.join(BENCHMARKS)} "
+            "(default: all)")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default='bench_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+        help='save these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark {name!r}')
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        results[name] = BENCHMARKS[name]()
+        for metric, value in results[name].items():
+            print(f'{name}.{metric}: {value:,.6g}')
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as output:
+            json.dump(results, output, indent=2)
+        return 0
+    try:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        # Baselines depend on the machine, so each keeps its own
+        print(f'No baseline at {args.baseline} to compare against; run '
+            'with --save-baseline to make one', file=sys.stderr)
+        return 1
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f'\nREGRESSIONS against {args.baseline}:', file=sys.stderr)
+        for regression in regressions:
+            print(f'  {regression}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
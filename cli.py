@@ -0,0 +1,167 @@
+"""One entry point to play, self-play, solve, benchmark and serve games
+
+    python -m cli play ttt                  - you against the solved table
+    python -m cli play ttt --gui            - the Tkinter board
+    python -m cli play mnk width=4 height=4 k=3 --x deepening --o mcts
+    python -m cli self-play nim count=13 --x smart --o dumb --games 1000
+    python -m cli solve ttt --export positions
+    python -m cli solve mnk width=4 height=3 k=3
+    python -m cli bench search grid_walk
+    python -m cli serve --port 7878
+
+Games and players are chosen by name from games.GAMES and games.PLAYERS,
+the same games the server hosts and a game log records, and a game's
+options are given as key=value. Each entry only imports the modules it
+needs as it is used, so --help and headless runs don't load Tkinter,
+the precomputed tables or any game that isn't played.
+"""
+
+import argparse
+import os
+import sys
+from games import GAMES, MOST_SOLVED_SQUARES, PLAYERS
+
+
+def _options(entries: list[str]) -> dict[str, str]:
+    options = {}
+    for entry in entries:
+        key, equals, value = entry.partition('=')
+        if not equals:
+            raise ValueError(f'Give game options as key=value, not {entry}')
+        options[key] = value
+    return options
+
+def _new_game(args, default_x: str, default_o: str):
+    entry = GAMES[args.game]
+    names = entry.names
+    players = (
+        PLAYERS[args.x or default_x](names[0], args.game, args.time),
+        PLAYERS[args.o or default_o](names[1], args.game, args.time),
+    )
+    return entry.new_game(players, _options(args.options))
+
+
+def play(args) -> None:
+    if args.gui:
+        if args.game != 'ttt':
+            raise ValueError('Only ttt has a window to play in')
+        from tk_tac_toe import Board, Game
+        Board(Game()).mainloop()
+        return
+    from engine import play_engine
+    play_engine(_new_game(args, 'human', GAMES[args.game].computer))
+
+def self_play(args) -> None:
+    from selfplay import self_play
+    game = _new_game(args, 'smart', 'dumb')
+    print(self_play(game, args.games, args.workers, args.seed, args.log))
+
+def solve(args) -> None:
+    GAMES[args.game].solve(_options(args.options), args.export)
+
+def bench(args) -> int:
+    from bench import main
+    return main(args.args)
+
+def serve(args) -> None:
+    import asyncio
+    from server import serve
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout,
+            args.threads))
+    except KeyboardInterrupt:
+        pass
+
+
+def _formatter(prog: str) -> argparse.HelpFormatter:
+    """A HelpFormatter as wide as the terminal. argparse makes one for
+    each argument it is given, and left to find the width itself, each
+    imports shutil, which takes a good part of the time to start."""
+    try:
+        width = os.get_terminal_size().columns
+    except OSError:
+        width = 80
+    return argparse.HelpFormatter(prog, width=width)
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli',
+        formatter_class=_formatter,
+        description=__doc__.splitlines()[0],
+        epilog='games: ' + '; '.join(
+            f'{name} - {entry.help}' for name, entry in GAMES.items()))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name: str, **options) -> argparse.ArgumentParser:
+        return commands.add_parser(name, formatter_class=_formatter,
+            **options)
+
+    def add_game(command: argparse.ArgumentParser) -> None:
+        command.add_argument('game', choices=GAMES)
+        command.add_argument('options', nargs='*',
+            help='game options, such as width=4 height=4 k=3')
+
+    def add_players(command: argparse.ArgumentParser) -> None:
+        command.add_argument('--x', choices=PLAYERS,
+            help='the player moving first')
+        command.add_argument('--o', choices=PLAYERS,
+            help='the player moving second')
+        command.add_argument('--time', type=float, default=1.0,
+            help='seconds a timed player thinks for each move')
+
+    play_command = add_command('play', help='play a game',
+        description='Plays a game, by default you against the computer')
+    add_game(play_command)
+    add_players(play_command)
+    play_command.add_argument('--gui', action='store_true',
+        help='play ttt in a window')
+    play_command.set_defaults(run=play)
+
+    self_play_command = add_command('self-play',
+        help='play computers against each other',
+        description='Plays many games headless, by default smart '
+            'against dumb')
+    add_game(self_play_command)
+    add_players(self_play_command)
+    self_play_command.add_argument('--games', type=int, default=100)
+    self_play_command.add_argument('--workers', type=int,
+        help='processes to play on (default: one for each CPU)')
+    self_play_command.add_argument('--seed', type=int)
+    self_play_command.add_argument('--log',
+        help='a game log to append the games to')
+    self_play_command.set_defaults(run=self_play)
+
+    solve_command = add_command('solve', help='solve a game',
+        description='Solves a game from its start. ttt builds the solved '
+            'table, which path=... puts elsewhere. mnk needs its width, '
+            'height and k, as the default board is far too big, and '
+            f'solves boards of up to {MOST_SOLVED_SQUARES} squares.')
+    add_game(solve_command)
+    solve_command.add_argument('--export', metavar='DIRECTORY',
+        help='write every ttt or mnk position to .npy files there')
+    solve_command.set_defaults(run=solve)
+
+    bench_command = add_command('bench', help='run benchmarks',
+        description='Runs bench.py, given the arguments that follow')
+    bench_command.add_argument('args', nargs=argparse.REMAINDER)
+    bench_command.set_defaults(run=bench)
+
+    serve_command = add_command('serve', help='run a game server')
+    serve_command.add_argument('--host', default='127.0.0.1')
+    # server.DEFAULT_PORT, which isn't imported so that --help stays fast
+    serve_command.add_argument('--port', type=int, default=7878)
+    serve_command.add_argument('--idle-timeout', type=float, default=60.0)
+    serve_command.add_argument('--threads', type=int)
+    serve_command.set_defaults(run=serve)
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.run(args) or 0
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
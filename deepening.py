@@ -0,0 +1,149 @@
+"""A depth limited search for boards too large to search to the end"""
+
+from math import inf
+from time import perf_counter
+from collections.abc import Iterable
+from engine import ComputerPlayer, GameState
+from move_order import HeuristicOrdering, MoveOrdering
+
+
+def line_balance(mine: int, theirs: int, masks: Iterable[int],
+    length: int) -> float:
+    """Scores the lines of a bitboard game, from -1 to 1. A line that
+    only one player has marks in counts for them, and counts for more
+    the more marks it has."""
+    balance = 0
+    lines = 0
+    for mask in masks:
+        lines += 1
+        if not theirs & mask:
+            balance += 3 ** (mine & mask).bit_count() - 1
+        elif not mine & mask:
+            balance -= 3 ** (theirs & mask).bit_count() - 1
+    return balance / (lines * 3 ** length) if lines else 0.0
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time is up"""
+
+
+class _Search:
+    """The state of one depth limited search. The clock is read every
+    so many nodes, as many as take about check_seconds, so that a
+    search overruns its deadline by little more than that however long
+    each node takes, as on large boards."""
+
+    check_seconds = 0.001
+    most_between_checks = 256
+
+    def __init__(self, deadline: float, ordering: MoveOrdering) -> None:
+        self.deadline = deadline
+        self.ordering = ordering
+        self.nodes = 0
+        self.cut_short = False
+        self.between_checks = 1
+        self.until_check = 1
+        self.last_check = perf_counter()
+
+    def check(self) -> None:
+        """Counts a node, and raises SearchTimeout if the deadline has
+        passed when the clock is read"""
+        self.nodes += 1
+        self.until_check -= 1
+        if self.until_check:
+            return
+        now = perf_counter()
+        if now > self.deadline:
+            raise SearchTimeout
+        per_node = (now - self.last_check) / self.between_checks
+        self.between_checks = max(1, min(self.most_between_checks,
+            int(self.check_seconds / per_node) if per_node else
+            self.most_between_checks))
+        self.until_check = self.between_checks
+        self.last_check = now
+
+    def negamax(self, game: GameState, depth: int, alpha, beta,
+        ply: int) -> float:
+        """Returns the score of game for the player to move in it"""
+        self.check()
+        if game.won or game.tie:
+            return game.score(game.current_player)
+        if depth == 0:
+            self.cut_short = True
+            return game.evaluate(game.current_player)
+        value = -inf
+        for move in self.ordering.order(game, game.legal_moves, ply):
+            score = -self.negamax(
+                game.move(move), depth - 1, -beta, -alpha, ply + 1)
+            value = max(value, score)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.ordering.cutoff(move, ply)
+                break
+        return value
+
+
+class DeepeningComputer(ComputerPlayer):
+    """Searches one move deeper at a time until its time_limit, in
+    seconds, runs out, or max_depth is reached, or the whole game tree
+    has been searched. Positions at the depth limit are scored by the
+    game's evaluate method. Plays the best moves found by the last
+    search that finished."""
+
+    fields = ('name', 'speed', 'time_limit', 'max_depth')
+
+    def __init__(self, name: str = 'I', speed: float = 0.0,
+        time_limit: float = 1.0, max_depth: int | None = None,
+        ordering: MoveOrdering = None) -> None:
+        super().__init__(name, speed)
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.ordering = HeuristicOrdering() if ordering is None else ordering
+
+    def inteligent_moves(self, game: GameState) -> list:
+        search = _Search(perf_counter() + self.time_limit, self.ordering)
+        self.ordering.start()
+        good_moves = list(self.ordering.order(game, game.legal_moves, 0))
+        if len(good_moves) < 2:
+            return good_moves
+        children = []
+        try:
+            for move in good_moves:
+                search.check()
+                children.append((move, game.move(move)))
+        except SearchTimeout:
+            return good_moves
+        depth = 1
+        while self.max_depth is None or depth <= self.max_depth:
+            search.cut_short = False
+            try:
+                scores = self.search_root(search, children, depth)
+            except SearchTimeout:
+                break
+            best_option_score = max(scores)
+            good_moves = [
+                move
+                for (move, next_state), score in zip(children, scores)
+                if score == best_option_score
+            ]
+            # Search the best moves first at the next depth
+            order = sorted(range(len(children)),
+                key=lambda n: scores[n], reverse=True)
+            children = [children[n] for n in order]
+            if not search.cut_short:
+                break
+            depth += 1
+        return good_moves
+
+    def search_root(self, search: _Search, children: list, depth: int
+    ) -> list[float]:
+        scores = []
+        best_option_score = -inf
+        for move, next_state in children:
+            # A window just below the best score so far still finds the
+            # exact score of any move that ties it
+            score = -search.negamax(
+                next_state, depth - 1, -inf, 1 - best_option_score, 1)
+            best_option_score = max(best_option_score, score)
+            scores.append(score)
+        return scores
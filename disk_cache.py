@@ -0,0 +1,150 @@
+"""A search cache kept on disk, so that restarted processes start warm
+
+Positions are stored in an sqlite database in WAL mode, which lets
+any number of processes read it while one writes. Each position is
+keyed by the name of its game and the repr of its cache key, so keys
+must have the same repr in every process. Writes are held back and
+written together in batches.
+
+The database records a version for each game. Opening it with a
+different version, as after changing how a game is scored, throws
+away what was stored for that game.
+
+A TranspositionTable given a DiskCache as its backend looks positions
+up in it when they aren't in memory, and stores what it finds in it.
+persist() does the same for a search function cached by
+search_cache.cached, as in game_engin's players and min_tac_toe.
+"""
+
+from functools import wraps
+import sqlite3
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from search_cache import EXACT, cached
+
+CACHE_VERSION = 4
+
+
+class DiskCache:
+    """The (value, flag) pairs stored on disk for one game"""
+
+    def __init__(self, path: str, game: str, version: str = '',
+        batch: int = 1000) -> None:
+        self.path = path
+        self.game = game
+        self.version = f'{CACHE_VERSION}:{version}'
+        self.batch = batch
+        self.hits = 0
+        self.misses = 0
+        self._pending: Dict[bytes, Tuple[Any, int]] = {}
+        self._connection = sqlite3.connect(path, timeout=30,
+            isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            self._connection.execute('BEGIN IMMEDIATE')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS versions '
+                '(game TEXT PRIMARY KEY, version TEXT)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS positions '
+                '(game TEXT, key BLOB, value, flag INTEGER, '
+                'PRIMARY KEY (game, key)) WITHOUT ROWID')
+            stored = self._connection.execute(
+                'SELECT version FROM versions WHERE game = ?',
+                (game,)).fetchone()
+            if stored is None or stored[0] != self.version:
+                self._connection.execute(
+                    'DELETE FROM positions WHERE game = ?', (game,))
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO versions VALUES (?, ?)',
+                    (game, self.version))
+
+    @staticmethod
+    def encode(key: Hashable) -> bytes:
+        return repr(key).encode()
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, int]]:
+        """Returns the (value, flag) stored for key, or None"""
+        encoded = self.encode(key)
+        entry = self._pending.get(encoded)
+        if entry is None:
+            entry = self._connection.execute(
+                'SELECT value, flag FROM positions WHERE game = ? AND key = ?',
+                (self.game, encoded)).fetchone()
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, value, flag: int = EXACT) -> None:
+        self._pending[self.encode(key)] = (value, flag)
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the pending positions in one transaction. An exact
+        value already on disk isn't replaced by a bound."""
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.execute('BEGIN IMMEDIATE')
+            self._connection.executemany(
+                'INSERT INTO positions VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (game, key) DO UPDATE '
+                'SET value = excluded.value, flag = excluded.flag '
+                f'WHERE positions.flag != {EXACT}',
+                [
+                    (self.game, key, value, flag)
+                    for key, (value, flag) in self._pending.items()
+                ])
+        self._pending.clear()
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM positions WHERE game = ?',
+            (self.game,)).fetchone()[0]
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self) -> 'DiskCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __reduce__(self):
+        # Each process opens its own connection to the same database
+        return DiskCache, (self.path, self.game,
+            self.version.partition(':')[2], self.batch)
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}({self.path!r}, {self.game!r}, '
+            f'hits={self.hits}, misses={self.misses})')
+
+
+def cached_on_disk(function: Callable, disk: DiskCache) -> Callable:
+    """Wraps a search function so that its results are looked up on
+    disk, under the repr of its arguments, before being worked out.
+    Call disk.flush() or disk.close() once done, to write the last
+    batch."""
+    @wraps(function)
+    def lookup(*args, **kwargs):
+        key = args + tuple(kwargs.items())
+        entry = disk.get(key)
+        if entry is not None:
+            return entry[0]
+        value = function(*args, **kwargs)
+        disk.put(key, value)
+        return value
+    return lookup
+
+def persist(owner, name: str, disk: DiskCache) -> None:
+    """Puts disk behind the function name in owner, a module or an
+    object such as a game_engin.SmartComputer, which must be cached by
+    search_cache.cached. The new cache has the same maxsize and scope,
+    and the function's recursive calls go through it."""
+    function = getattr(owner, name)
+    setattr(owner, name, cached(function.maxsize, function.scope)(
+        cached_on_disk(function.__wrapped__, disk)))
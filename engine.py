@@ -1,18 +1,85 @@
-from dataclasses import dataclass
-from functools import cache
+from collections import Counter
+from collections.abc import Callable, Collection, Hashable, Iterator
+from math import inf
 import random
-from time import sleep
-from typing import Any, List, Tuple
+from time import perf_counter, sleep
+from move_order import HeuristicOrdering, MoveOrdering
+from search_cache import EXACT, LOWER, UPPER, TranspositionTable
+
+class Turns(tuple):
+    """A pair of players in turn order, which keeps the same pair in the 
+    other order, so that a game's states share two pairs rather than 
+    each making its own"""
+
+    def __new__(cls, players: tuple['Player', 'Player']) -> 'Turns':
+        turns = super().__new__(cls, players)
+        swapped = super().__new__(cls, (players[1], players[0]))
+        turns.swapped = swapped
+        swapped.swapped = turns
+        return turns
+
+
+class ByFields:
+    """Compares, hashes and shows instances by their class and the
+    attributes listed in fields, which are not to change once made.
+
+    It stands in for frozen dataclasses, since importing dataclasses and
+    typing would take up much of a headless game's time to start."""
+
+    __slots__ = ()
+
+    fields = ()
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.fields)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+    def __repr__(self) -> str:
+        values = ', '.join(
+            f'{field}={getattr(self, field)!r}' for field in self.fields)
+        return f'{type(self).__name__}({values})'
+
 
 class GameState:
     """Parent class for the current state of many possible games
-    Should be a frozen dataclass for minimax to work quickly."""
+    Should be immutable and hashable, for minimax to work quickly, with
+    slots, since searches hold a great many states.
+
+    Each state carries the pair of players in the game, with the 
+    player whose turn it is first. Keeping the pairing in the state, 
+    rather than anywhere global, lets any number of games run at once."""
+
+    __slots__ = ()
+
+    state: object
+    players: tuple['Player', 'Player']
+
+    @property
+    def current_player(self) -> 'Player':
+        return self.players[0]
 
-    state: Any
-    current_player: 'Player'
+    @property
+    def opponent(self) -> 'Player':
+        """The player whose turn it is not"""
+        return self.players[1]
+
+    @property
+    def next_players(self) -> tuple['Player', 'Player']:
+        """The players in turn order once the current player has moved"""
+        players = self.players
+        if type(players) is not Turns:
+            players = Turns(players)
+        return players.swapped
 
     @property
-    def potential_moves(self) -> List:
+    def potential_moves(self) -> list:
         """Returns a list of all moves that might be taken, without 
         validation that the move is legal"""
         ...
@@ -23,17 +90,37 @@ class GameState:
         Invalid moves raise a ValueError."""
         ...
 
+    def is_legal(self, move) -> bool:
+        """Whether move may be taken. Games should override this with a 
+        check that doesn't make the move."""
+        try:
+            self.move(move)
+        except ValueError:
+            return False
+        return True
+
+    @property
+    def legal_moves(self) -> Iterator:
+        """Yields the legal moves, in the order of potential_moves"""
+        return (move for move in self.potential_moves if self.is_legal(move))
+
+    @property
+    def children(self) -> Iterator[tuple[object, 'GameState']]:
+        """Yields each legal move with the new GameState it leads to. 
+        Each state is only made when it is reached."""
+        return ((move, self.move(move)) for move in self.legal_moves)
+
+    @property
+    def has_moves(self) -> bool:
+        for move in self.legal_moves:
+            return True
+        return False
+
     @property
-    def possible_moves(self) -> List[Tuple[Any, "GameState"]]:
+    def possible_moves(self) -> list[tuple[object, "GameState"]]:
         """Returns a discription of the move and the new GameState 
         for each of the possible moves"""
-        moves = []
-        for move in self.potential_moves:
-            try:
-                moves.append((move, self.move(move)))
-            except ValueError:
-                continue
-        return moves
+        return list(self.children)
     
     def display(self) -> None:
         """Displays the current game state"""
@@ -42,39 +129,79 @@ class GameState:
     def won(self) -> bool:
         ...
 
+    win_on_my_turn = False
+
+    @property
+    def winning_moves(self) -> Collection:
+        """Moves that win the game for the player to move. Games should 
+        override this with a check that doesn't make every move."""
+        return {
+            move
+            for move, next_state in self.children
+            if next_state.won and not next_state.win_on_my_turn
+        }
+
+    @property
+    def threat_moves(self) -> Collection:
+        """Moves that would win the game for the player who is not to 
+        move, if it were their turn"""
+        return ()
+
+    def static_priority(self, move) -> int:
+        """How promising a move looks before searching it. Moves with 
+        higher priorities are searched first."""
+        return 0
+
+    @property
+    def cache_key(self) -> Hashable:
+        """The key search results for this state are cached under. 
+        States that must score the same, such as reflections of a 
+        board, may share a key. Caches kept on disk store the repr of 
+        the key, so it should be the same in every process."""
+        return self
+
+    @property
+    def exact_key(self) -> Hashable:
+        """A key that two states share only if they must score the 
+        same. Tables in debug mode keep it beside each cache_key, to 
+        catch cache_keys, such as Zobrist keys, that collide."""
+        return self.cache_key
+
     def score(self, player) -> int:
         ...
+
+    def evaluate(self, player) -> float:
+        """Estimates how good a game that is not over yet is for the 
+        player, from -1 to 1. Scores of finished games must be whole 
+        numbers, so that a win always outweighs an estimate."""
+        return 0.0
     
     @property
     def tie(self) -> bool:
-        if self.won:
-            return False
-        elif [*self.possible_moves] == []:
-            return True
-        else:
-            return False
+        return not self.won and not self.has_moves
+
+class Player(ByFields):
+    """A player in a game, known by name"""
+
+    fields = ('name',)
 
-@dataclass(frozen=True)
-class Player:
-    name: str
+    def __init__(self, name: str) -> None:
+        self.name = name
 
     def get_move(self, game: GameState):
         """Returns a discription of the next move to take, as per the 
         player's inteligence, given the current game state"""
 
-    @property
-    def opponent(self) -> 'Player':
-        player_list = [*reversed(players)]
-        for n, player in enumerate(player_list):
-            if player is self:
-                return player_list[n-1]
-        raise ValueError('This player is not in the Players list')
+    def new_game(self, game: GameState) -> None:
+        """Called as a game the player is in starts"""
     
 
-@dataclass(frozen=True)
 class ComputerPlayer(Player):
-    name: str = 'I'
-    speed: float = 0.0
+    fields = ('name', 'speed')
+
+    def __init__(self, name: str = 'I', speed: float = 0.0) -> None:
+        super().__init__(name)
+        self.speed = speed
 
     def get_move(self, game: GameState):
         move = random.choice(self.inteligent_moves(game))
@@ -82,7 +209,7 @@ class ComputerPlayer(Player):
         self.report_move(move)
         return move
 
-    def inteligent_moves(self, game: GameState) -> List:
+    def inteligent_moves(self, game: GameState) -> list:
         ...
 
     def report_move(self, move) -> None:
@@ -90,11 +217,15 @@ class ComputerPlayer(Player):
         pass
 
 
-def play_engine(game:GameState, player_list: Tuple[Player, Player]):
-    """Have players play any turn based game"""
+def play_engine(game:GameState,
+    on_move: Callable[[Player, object, GameState], None] = None):
+    """Have the game's players play any turn based game. If given, 
+    on_move is called after each move with the player, their move and 
+    the new game state."""
 
-    global players
-    players = player_list
+    players = game.players
+    for player in players:
+        player.new_game(game)
     game.display()
     while not game.won and not game.tie:
         player = game.current_player
@@ -103,6 +234,8 @@ def play_engine(game:GameState, player_list: Tuple[Player, Player]):
             game = game.move(move)
         except ValueError:
             continue
+        if on_move is not None:
+            on_move(player, move, game)
         game.display()
     if game.won:
         scores = [(game.score(player), player) for player in players]
@@ -113,40 +246,262 @@ def play_engine(game:GameState, player_list: Tuple[Player, Player]):
         print('Tie game')
 
 
-@dataclass(frozen=True)
+class SearchStats:
+    """What the search for a single move did. Depth counts moves ahead 
+    of the position the search started from."""
+
+    def __init__(self) -> None:
+        self.cutoffs = Counter()
+        self.reset()
+
+    @property
+    def branching_factor(self) -> float:
+        """The average number of children searched per expanded node"""
+        return self.children / self.expanded if self.expanded else 0.0
+
+    def reset(self) -> None:
+        """Sets every count back to 0"""
+        self.nodes = self.leaves = 0
+        self.cutoffs.clear()
+        self.cache_hits = self.cache_misses = 0
+        self.expanded = self.children = 0
+        self.seconds = 0.0
+
+    def add(self, other: 'SearchStats') -> None:
+        """Adds the counts of another search, such as one run by a 
+        worker process, leaving seconds alone"""
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.cutoffs.update(other.cutoffs)
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.expanded += other.expanded
+        self.children += other.children
+
+
+# The best score found so far at the root of a split search, shared 
+# with the worker processes searching its moves
+_root_bound = None
+
+def _start_worker(bound) -> None:
+    global _root_bound
+    _root_bound = bound
+
+def _search_task(player: 'SmartComputer', game: GameState, my_turn: bool,
+    depth: int, stats: SearchStats | None
+) -> tuple[int, SearchStats | None]:
+    """Searches one position of a split search in a worker process. 
+    The player and game arrive pickled together, so the players in the 
+    game are still the player searching."""
+    score = player.minimax(game, my_turn, best=_root_bound.value - 1,
+        depth=depth, stats=stats)
+    player.table.flush()
+    return score, stats
+
+
 class SmartComputer(ComputerPlayer):
-    
-    def inteligent_moves(self, game: GameState) -> List:
-        move_index = [
-            (move, self.minimax(next_state, my_turn=False))
-            for move, next_state in game.possible_moves
-        ]
-        best_option_score = max(score for move, score in move_index)
-        good_moves = [
-            move
-            for move, score in move_index
-            if score == best_option_score
-        ]
+    """Searches the whole game tree with alpha-beta minimax, trying 
+    moves in the order given by its ordering. Given a SearchStats as 
+    stats, each call to inteligent_moves fills it in with what that 
+    search did. The table and ordering are not locked, so threads 
+    playing at the same time should each have their own player.
+
+    How long the table keeps what it finds, and how much of it, is up 
+    to the table's maxsize and scope.
+
+    With more than one worker, the pool of worker processes is started 
+    by the first split search and kept for the player's later ones, 
+    along with the tables the workers fill in. close() shuts it down."""
+
+    def __init__(self, name: str = 'I', speed: float = 0.0,
+        table: TranspositionTable = None, ordering: MoveOrdering = None,
+        stats: SearchStats | None = None, workers: int = 1,
+        split_depth: int = 1) -> None:
+        super().__init__(name, speed)
+        self.table = TranspositionTable() if table is None else table
+        self.ordering = HeuristicOrdering() if ordering is None else ordering
+        self.stats = stats
+        self.workers = workers
+        self.split_depth = split_depth
+        self._pool = None
+        self._bound = None
+
+    def __getstate__(self) -> dict:
+        # The pool belongs to the process that started it
+        state = dict(self.__dict__)
+        state['_pool'] = state['_bound'] = None
+        return state
+
+    def close(self) -> None:
+        """Shuts down the worker processes of split searches, if any 
+        were started"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = self._bound = None
+
+    def inteligent_moves(self, game: GameState) -> list:
+        stats = self.stats
+        if stats is not None:
+            stats.reset()
+            start = perf_counter()
+        self.ordering.start()
+        moves = self.ordering.order(game, game.legal_moves, 0)
+        if self.workers > 1:
+            moves = list(moves)
+            scores = self.split_search(game, moves, stats)
+        else:
+            scores = {}
+        good_moves = []
+        best_option_score = -inf
+        for move in moves:
+            next_state = game.move(move)
+            key = next_state.cache_key
+            if key not in scores:
+                # Scores are whole numbers, so a window just below the 
+                # best score so far still finds the exact score of any 
+                # move that ties it, while worse moves are cut off early.
+                scores[key] = self.minimax(next_state, my_turn=False,
+                    best=best_option_score - 1, stats=stats)
+            score = scores[key]
+            if score > best_option_score:
+                best_option_score = score
+                good_moves = [move]
+            elif score == best_option_score:
+                good_moves.append(move)
+        self.table.flush()
+        if stats is not None:
+            stats.seconds = perf_counter() - start
         return good_moves
 
-    @cache
-    def minimax(self, game: GameState, my_turn: bool, best=-1, worst=1) -> int:
+    def new_game(self, game: GameState) -> None:
+        self.table.new_game()
+
+    def warm_up(self, game: GameState) -> None:
+        """Searches game ahead of play, so that its positions are in 
+        the table when play reaches them"""
+        self.inteligent_moves(game)
+
+    def split_search(self, game: GameState, moves: list,
+        stats: SearchStats = None) -> dict[Hashable, int]:
+        """Scores the states the moves lead to on a pool of worker 
+        processes, under their cache keys. As in the serial search, a score below 
+        the best one is only an upper bound."""
+        # Loaded here rather than on import, since they are slow to load
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        import multiprocessing
+
+        if self._pool is None:
+            self._bound = multiprocessing.Value('d', -inf)
+            self._pool = ProcessPoolExecutor(self.workers,
+                initializer=_start_worker, initargs=(self._bound,))
+        pool, bound = self._pool, self._bound
+        bound.value = -inf
+        # For each child, the lowest score found for it so far and the 
+        # number of its searches still running
+        lowest: dict[Hashable, int] = {}
+        running: dict[Hashable, int] = {}
+        scores = {}
+        tasks = {}
+
+        def submit(key, game: GameState, my_turn: bool, depth: int):
+            task_stats = None if stats is None else SearchStats()
+            tasks[pool.submit(_search_task, self, game, my_turn, depth,
+                task_stats)] = key
+            running[key] = running.get(key, 0) + 1
+
+        for move in moves:
+            next_state = game.move(move)
+            key = next_state.cache_key
+            if key in lowest:
+                continue
+            lowest[key] = inf
+            if (self.split_depth < 2
+                or next_state.won or next_state.tie):
+                submit(key, next_state, False, 1)
+                continue
+            # The opponent picks the lowest of the scores of their 
+            # replies, and each of them is exact when it is no 
+            # lower than the best score, so their minimum is too
+            replies = set()
+            for reply in self.ordering.order(
+                next_state, next_state.legal_moves, 1):
+                reply_state = next_state.move(reply)
+                if reply_state.cache_key not in replies:
+                    replies.add(reply_state.cache_key)
+                    submit(key, reply_state, True, 2)
+
+        for task in as_completed(tasks):
+            key = tasks[task]
+            score, task_stats = task.result()
+            if stats is not None:
+                stats.add(task_stats)
+            lowest[key] = min(lowest[key], score)
+            running[key] -= 1
+            if not running[key]:
+                scores[key] = lowest[key]
+                if scores[key] > bound.value:
+                    bound.value = scores[key]
+        return scores
+
+    def minimax(self, game: GameState, my_turn: bool, best=-inf, worst=inf,
+        depth: int = 1, stats: SearchStats = None) -> int:
+        """Returns the score of game for this player. A score at or
+        below best is an upper bound, and one at or above worst is a
+        lower bound. Scores within the window are exact."""
+        key = (game.cache_key, my_turn)
+        position = game.exact_key if self.table.debug else None
+        entry = self.table.probe(key, position)
+        if stats is not None:
+            stats.nodes += 1
+            if entry is None:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                best = max(best, value)
+            else:
+                worst = min(worst, value)
+            if worst <= best:
+                return value
         if game.won or game.tie:
-            return game.score(self)
+            value = game.score(self)
+            self.table.store(key, value, EXACT)
+            if stats is not None:
+                stats.leaves += 1
+            return value
+        window = best, worst
+        value = -inf if my_turn else inf
+        if stats is not None:
+            stats.expanded += 1
+        for move in self.ordering.order(game, game.legal_moves, depth):
+            next_state = game.move(move)
+            if stats is not None:
+                stats.children += 1
+            score = self.minimax(
+                next_state, not my_turn, best, worst, depth + 1, stats)
+            if my_turn:
+                value = max(value, score)
+                best = max(best, score)
+            else:
+                value = min(value, score)
+                worst = min(worst, score)
+            if worst <= best:
+                self.ordering.cutoff(move, depth)
+                if stats is not None:
+                    stats.cutoffs[depth] += 1
+                break
+        if value <= window[0]:
+            self.table.store(key, value, UPPER)
+        elif value >= window[1]:
+            self.table.store(key, value, LOWER)
         else:
-            scores = []
-            for move, next_state in game.possible_moves:
-                score = self.minimax(next_state, not my_turn, best, worst)
-                scores.append(score)
-                if my_turn:
-                    best = max(best, score)
-                else:
-                    worst = min(worst, score)
-                if worst <= best:
-                    break
-            return (max if my_turn else min)(scores)
-
-@dataclass(frozen=True)
+            self.table.store(key, value, EXACT)
+        return value
+
 class DumbComputer(ComputerPlayer):
-    def inteligent_moves(self, game: GameState) -> List:
-        return [move for move, state in game.possible_moves]
\ No newline at end of file
+    def inteligent_moves(self, game: GameState) -> list:
+        return list(game.legal_moves)
\ No newline at end of file
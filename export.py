@@ -0,0 +1,315 @@
+"""Exports every position reachable from a starting position, with its
+minimax value and best moves, as NumPy .npy files
+
+Works for ttt_engin.TicTacToeGrid and mnk.MNKGrid boards of up to 64
+squares, from the position given, and ignores an MNKGrid's reach. The
+positions are found a layer at a time, a layer being every position
+with the same number of marks. Each layer is sorted and has its
+repeats dropped on disk, merging sorted runs of at most sort_size
+positions, and so memory stays bounded however many positions there
+are. The layers are then solved from the last back to the first, by
+looking up the value of each child in the layer after it.
+
+Each .npy file holds up to chunk_size records of the structured type
+
+    planes   uint8, (2, height, width) - 1 where X, then O, has a mark
+    value    int8                      - for the player to move
+    moves    uint8, (height * width,)  - 1 for each best move
+
+The files are written without numpy, which is only needed to load
+them, by load_chunk(). read_chunk() reads them back without it.
+"""
+
+import ast
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, Iterator, List, Tuple
+from engine import GameState
+from mnk import lines
+
+POSITION = struct.Struct('>QQ')
+SOLVED = struct.Struct('>QQbQ')
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_LENGTH = struct.Struct('<H')
+
+
+def board_of(game: GameState) -> Tuple[int, int, int, int, int]:
+    """The width, height, k and bitboards of a TicTacToeGrid or MNKGrid"""
+    width = getattr(game, 'width', 3)
+    height = getattr(game, 'height', 3)
+    if width * height > 64:
+        raise ValueError('Only boards of up to 64 squares can be exported')
+    return width, height, getattr(game, 'k', 3), game.x, game.o
+
+
+def _sort_unique(records: Iterable[bytes], path: str, sort_size: int
+) -> int:
+    """Writes the distinct records to path in order, sorting at most
+    sort_size of them in memory at a time, and returns how many there
+    are"""
+    runs, run = [], []
+
+    def write_run() -> None:
+        run_path = f'{path}.run{len(runs)}'
+        with open(run_path, 'wb') as run_file:
+            run_file.write(b''.join(sorted(set(run))))
+        runs.append(run_path)
+        run.clear()
+
+    for record in records:
+        run.append(record)
+        if len(run) >= sort_size:
+            write_run()
+    if run or not runs:
+        write_run()
+    run_files = [open(run_path, 'rb') for run_path in runs]
+    count, last = 0, None
+    try:
+        with open(path, 'wb') as out:
+            merged = heapq.merge(*(
+                iter(lambda run_file=run_file: run_file.read(POSITION.size),
+                    b'')
+                for run_file in run_files
+            ))
+            for record in merged:
+                if record != last:
+                    out.write(record)
+                    count += 1
+                    last = record
+    finally:
+        for run_file in run_files:
+            run_file.close()
+        for run_path in runs:
+            os.remove(run_path)
+    return count
+
+
+def _read_records(path: str, record: struct.Struct) -> Iterator[tuple]:
+    with open(path, 'rb') as records:
+        while True:
+            data = records.read(record.size * 4096)
+            if not data:
+                return
+            yield from record.iter_unpack(data)
+
+
+def _layers(width: int, height: int, k: int, x: int, o: int,
+    workdir: str, sort_size: int) -> int:
+    """Writes each layer of positions reachable from x and o to its
+    own file, and returns the number of layers"""
+    masks = lines(width, height, k)
+    full = (1 << width * height) - 1
+    with open(os.path.join(workdir, 'layer0.pos'), 'wb') as first:
+        first.write(POSITION.pack(x, o))
+    layer = 0
+    while True:
+
+        def children() -> Iterator[bytes]:
+            for x, o in _read_records(
+                os.path.join(workdir, f'layer{layer}.pos'), POSITION):
+                if _over(x, o, masks, full):
+                    continue
+                x_to_move = x.bit_count() == o.bit_count()
+                empty = full & ~(x | o)
+                while empty:
+                    bit = empty & -empty
+                    empty ^= bit
+                    if x_to_move:
+                        yield POSITION.pack(x | bit, o)
+                    else:
+                        yield POSITION.pack(x, o | bit)
+
+        path = os.path.join(workdir, f'layer{layer + 1}.pos')
+        if not _sort_unique(children(), path, sort_size):
+            os.remove(path)
+            return layer + 1
+        layer += 1
+
+def _won(board: int, masks: Tuple[int, ...]) -> bool:
+    return any(board & mask == mask for mask in masks)
+
+def _over(x: int, o: int, masks: Tuple[int, ...], full: int) -> bool:
+    last = x if x.bit_count() > o.bit_count() else o
+    return _won(last, masks) or x | o == full
+
+
+def _lookup(data: mmap.mmap, count: int, key: bytes) -> int:
+    """The value stored for key in a file of SOLVED records in order"""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        start = middle * SOLVED.size
+        found = data[start:start + POSITION.size]
+        if found < key:
+            low = middle + 1
+        elif found > key:
+            high = middle
+        else:
+            return SOLVED.unpack_from(data, start)[2]
+    raise KeyError(key)
+
+def _solve_layers(width: int, height: int, k: int, layers: int,
+    workdir: str) -> None:
+    """Writes the value and best moves of every position, a layer at a
+    time from the last, looking its children up in the layer after"""
+    masks = lines(width, height, k)
+    full = (1 << width * height) - 1
+    for layer in reversed(range(layers)):
+        following = os.path.join(workdir, f'layer{layer + 1}.val')
+        data, count = None, 0
+        if os.path.exists(following) and os.path.getsize(following):
+            with open(following, 'rb') as following_file:
+                data = mmap.mmap(following_file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+            count = len(data) // SOLVED.size
+        try:
+            positions = os.path.join(workdir, f'layer{layer}.pos')
+            with open(os.path.join(workdir, f'layer{layer}.val'),
+                'wb') as solved:
+                for x, o in _read_records(positions, POSITION):
+                    value, best = _solve(x, o, masks, full, data, count)
+                    solved.write(SOLVED.pack(x, o, value, best))
+            os.remove(positions)
+        finally:
+            if data is not None:
+                data.close()
+
+def _solve(x: int, o: int, masks: Tuple[int, ...], full: int,
+    data: mmap.mmap, count: int) -> Tuple[int, int]:
+    blanks = full & ~(x | o)
+    last = x if x.bit_count() > o.bit_count() else o
+    if _won(last, masks):
+        return -(1 + blanks.bit_count()), 0
+    if not blanks:
+        return 0, 0
+    x_to_move = x.bit_count() == o.bit_count()
+    value, best = None, 0
+    empty = blanks
+    while empty:
+        bit = empty & -empty
+        empty ^= bit
+        if x_to_move:
+            key = POSITION.pack(x | bit, o)
+        else:
+            key = POSITION.pack(x, o | bit)
+        score = -_lookup(data, count, key)
+        if value is None or score > value:
+            value, best = score, bit
+        elif score == value:
+            best |= bit
+    return value, best
+
+
+def solved_positions(game: GameState, workdir: str = None,
+    sort_size: int = 1 << 16) -> Iterator[Tuple[int, int, int, int]]:
+    """Yields the bitboards, value and best moves mask of every
+    position reachable from game, breadth first. Working files go in
+    workdir, or a temporary directory."""
+    width, height, k, x, o = board_of(game)
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        layers = _layers(width, height, k, x, o, directory, sort_size)
+        _solve_layers(width, height, k, layers, directory)
+        for layer in range(layers):
+            path = os.path.join(directory, f'layer{layer}.val')
+            yield from _read_records(path, SOLVED)
+            os.remove(path)
+
+
+def _dtype(width: int, height: int) -> list:
+    return [('planes', '|u1', (2, height, width)), ('value', '|i1'),
+        ('moves', '|u1', (width * height,))]
+
+def _npy_header(width: int, height: int, rows: int) -> bytes:
+    header = repr({
+        'descr': _dtype(width, height),
+        'fortran_order': False,
+        'shape': (rows,),
+    })
+    # The header is padded so that the data starts on a 64 byte boundary
+    padding = -(len(NPY_MAGIC) + NPY_LENGTH.size + len(header) + 1) % 64
+    header = (header + ' ' * padding + '\n').encode('latin1')
+    return NPY_MAGIC + NPY_LENGTH.pack(len(header)) + header
+
+def _bits(board: int, squares: int) -> bytes:
+    return bytes(board >> square & 1 for square in range(squares))
+
+def write_chunk(path: str, records: List[Tuple[int, int, int, int]],
+    width: int, height: int) -> None:
+    """Writes records of bitboards, value and best moves mask to path
+    as a .npy file"""
+    squares = width * height
+    with open(path, 'wb') as chunk:
+        chunk.write(_npy_header(width, height, len(records)))
+        chunk.write(b''.join(
+            _bits(x, squares) + _bits(o, squares)
+            + struct.pack('b', value) + _bits(best, squares)
+            for x, o, value, best in records
+        ))
+
+def export(game: GameState, directory: str, chunk_size: int = 1 << 16,
+    workdir: str = None, sort_size: int = 1 << 16) -> List[str]:
+    """Writes every position reachable from game to .npy files of at
+    most chunk_size records in directory, and returns their paths"""
+    width, height = board_of(game)[:2]
+    os.makedirs(directory, exist_ok=True)
+    paths, records = [], []
+
+    def write() -> None:
+        path = os.path.join(directory, f'positions-{len(paths):05}.npy')
+        write_chunk(path, records, width, height)
+        paths.append(path)
+        records.clear()
+
+    for record in solved_positions(game, workdir, sort_size):
+        records.append(record)
+        if len(records) >= chunk_size:
+            write()
+    if records:
+        write()
+    return paths
+
+
+def read_chunk(path: str) -> Iterator[Tuple[int, int, int, int]]:
+    """Yields the bitboards, value and best moves mask of each record
+    in a .npy file written by export"""
+    with open(path, 'rb') as chunk:
+        if chunk.read(len(NPY_MAGIC)) != NPY_MAGIC:
+            raise ValueError(f'{path} is not a version 1.0 .npy file')
+        length, = NPY_LENGTH.unpack(chunk.read(NPY_LENGTH.size))
+        header = ast.literal_eval(chunk.read(length).decode('latin1'))
+        planes = header['descr'][0][2]
+        squares = planes[1] * planes[2]
+        size = 3 * squares + 1
+        while True:
+            record = chunk.read(size)
+            if len(record) < size:
+                return
+            boards = [
+                sum(bit << square for square, bit in enumerate(
+                    record[start:start + squares]))
+                for start in (0, squares, 2 * squares + 1)
+            ]
+            value = struct.unpack_from('b', record, 2 * squares)[0]
+            yield boards[0], boards[1], value, boards[2]
+
+def load_chunk(path: str):
+    """Loads a .npy file written by export as a numpy structured array"""
+    # Imported here, as only loading needs numpy and it is slow to import
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            'numpy is needed to load exported positions') from None
+    return numpy.load(path)
+
+
+if __name__ == '__main__':
+    import sys
+    from ttt_engin import TicTacToeGrid
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'positions'
+    paths = export(TicTacToeGrid(), directory)
+    print(f'Wrote {len(paths)} files to {directory}')
@@ -1,9 +1,10 @@
-from dataclasses import dataclass
-from functools import cache
+from dataclasses import dataclass, field
 from itertools import cycle
 import random
 from time import sleep
-from typing import Any, Iterable, List, Tuple
+from typing import Any, Collection, Iterable, List, Optional, Tuple
+from move_order import HeuristicOrdering, MoveOrdering
+from search_cache import GAME, SearchCache, cached
 
 class GameState:
     """Parent class for the current state of many possible games
@@ -41,6 +42,25 @@ class GameState:
     
     win_on_my_turn = False
 
+    @property
+    def winning_moves(self) -> Collection:
+        """Moves that win the game for the player to move"""
+        return {
+            move
+            for move, next_state in self.possible_moves
+            if next_state.won and not next_state.win_on_my_turn
+        }
+
+    @property
+    def threat_moves(self) -> Collection:
+        """Moves that would win the game for the player who is not to 
+        move, if it were their turn"""
+        return ()
+
+    def static_priority(self, move) -> int:
+        """How promising a move looks before searching it"""
+        return 0
+
     @property
     def tie(self) -> bool:
         if self.won:
@@ -58,6 +78,9 @@ class Player:
         """Returns a discription of the next move to take, as per the 
         player's inteligence, given the current game state"""
 
+    def new_game(self, game: GameState) -> None:
+        """Called as a game the player is in starts"""
+
 @dataclass
 class ComputerPlayer(Player):
     name: str = 'I'
@@ -80,6 +103,9 @@ class ComputerPlayer(Player):
 def play_engin(game:GameState, players: Iterable):
     """Have players play any turn based game"""
 
+    players = list(players)
+    for player in players:
+        player.new_game(game)
     players = cycle(players)
 
     game.display()
@@ -102,34 +128,53 @@ def play_engin(game:GameState, players: Iterable):
         print('Tie game')
 
 
-@cache
-def minimax(game: GameState, my_turn: bool, best=-1, worst=1) -> int:
-    if game.won:
-        if game.win_on_my_turn:
-            return 1 if my_turn else -1
-        else:
-            return 1 if not my_turn else -1
-    elif game.tie:
-        return 0
-    else:
-        scores = []
-        for move, next_state in game.possible_moves:
-            score = minimax(next_state, not my_turn, best, worst)
-            scores.append(score)
-            if my_turn:
-                best = max(best, score)
-            else:
-                worst = min(worst, score)
-            if worst <= best:
-                break
-        return (max if my_turn else min)(scores)
-
 @dataclass
 class SmartComputer(ComputerPlayer):
+    """Searches with minimax, cached in a table of its own that holds at
+    most maxsize positions and is emptied as each game starts. The 
+    move ordering is its own too, so players searching at once don't 
+    mix up each other's killers and history."""
+
+    ordering: MoveOrdering = field(default_factory=HeuristicOrdering,
+        repr=False, compare=False)
+    maxsize: Optional[int] = 1 << 16
+    minimax: SearchCache = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.minimax = cached(self.maxsize, GAME)(self._minimax)
+
+    def _minimax(self, game: GameState, my_turn: bool, best=-1, worst=1
+    ) -> int:
+        if game.won:
+            if game.win_on_my_turn:
+                return 1 if my_turn else -1
+            else:
+                return 1 if not my_turn else -1
+        elif game.tie:
+            return 0
+        else:
+            scores = []
+            children = dict(game.possible_moves)
+            for move in self.ordering.order(game, children):
+                score = self.minimax(children[move], not my_turn, best,
+                    worst)
+                scores.append(score)
+                if my_turn:
+                    best = max(best, score)
+                else:
+                    worst = min(worst, score)
+                if worst <= best:
+                    self.ordering.cutoff(move)
+                    break
+            return (max if my_turn else min)(scores)
+
+    def new_game(self, game: GameState) -> None:
+        self.minimax.new_game()
     
     def inteligent_moves(self, game: GameState) -> List:
+        self.ordering.start()
         move_index = [
-            (move, minimax(next_state, my_turn=False))
+            (move, self.minimax(next_state, my_turn=False))
             for move, next_state in game.possible_moves
         ]
         best_option_score = max(score for move, score in move_index)
@@ -0,0 +1,276 @@
+"""A compact, append-only binary log of played games
+
+The log starts with a small header, and then holds one record for each
+game, written whole once the game is over:
+
+    record length      varint
+    game type          1 byte, its place in GAME_TYPES and games.GAMES
+    parameters         a varint count, then a varint each
+    seed               varint, 0 for none and seed + 1 for a seed
+    player names       for each, a varint length and UTF-8 text
+    moves              a varint each, to the end of the record
+
+A varint takes one byte for a number below 128, so each move on a board
+of up to 128 squares, or each take from a Nim pot, takes one byte.
+
+A GameLogWriter is given the starting state of each game, and then
+gets each move as the on_move of engine.play_engine or
+selfplay.play_headless. It holds records back and writes them in
+batches. read_games yields the records of a log one at a time, read in
+buffered chunks or through a memory map, so a log of any size can be
+read. The states of a game are only rebuilt when asked for.
+
+If a process stops while writing, the log may end in part of a record,
+which readers leave out.
+"""
+
+from dataclasses import dataclass
+import importlib
+import mmap
+import os
+import struct
+from typing import (Any, BinaryIO, Callable, Iterator, List, Optional,
+    Sequence, Tuple)
+from engine import GameState, Player
+from games import GAMES
+
+MAGIC = b'GLOG'
+VERSION = 1
+HEADER = struct.Struct('<4sB3x')
+
+
+def write_varint(out: bytearray, number: int) -> None:
+    while number >= 0x80:
+        out.append(number & 0x7F | 0x80)
+        number >>= 7
+    out.append(number)
+
+def read_varint(data: Sequence[int], offset: int) -> Tuple[int, int]:
+    """Returns the number at offset, and the offset after it"""
+    number = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, offset
+        shift += 7
+
+
+@dataclass(frozen=True)
+class LoggedGame:
+    """How to log one type of game. params are the whole numbers that,
+    with the players, make its starting state, given to new_game along
+    with the class of its states. Each move is logged as a whole
+    number."""
+
+    name: str
+    module: str
+    class_name: str
+    params: Callable[[GameState], Tuple[int, ...]]
+    new_game: Callable[[type, Tuple[int, ...], Tuple[Player, Player]],
+        GameState]
+    encode: Callable[[Tuple[int, ...], Any], int]
+    decode: Callable[[Tuple[int, ...], int], Any]
+
+    @property
+    def state_class(self) -> type:
+        return getattr(importlib.import_module(self.module), self.class_name)
+
+
+# Every game in games.GAMES, its place there being its code in the log
+GAME_TYPES = tuple(
+    LoggedGame(name, game.module, game.class_name, game.params,
+        game.from_params, game.encode, game.decode)
+    for name, game in GAMES.items()
+)
+
+def logged_game(game: GameState) -> Tuple[int, LoggedGame]:
+    """The place in GAME_TYPES of the type of game, and its entry"""
+    for code, logged in enumerate(GAME_TYPES):
+        if (type(game).__name__ == logged.class_name
+            and isinstance(game, logged.state_class)):
+            return code, logged
+    raise ValueError(f'{type(game).__name__} games can not be logged')
+
+
+@dataclass(frozen=True)
+class GameRecord:
+    """One game read from a log. Its moves are decoded, and its states
+    rebuilt with stand-in players of the same names, when asked for."""
+
+    game_type: str
+    params: Tuple[int, ...]
+    seed: Optional[int]
+    names: Tuple[str, str]
+    encoded_moves: bytes
+
+    @property
+    def logged(self) -> LoggedGame:
+        return next(
+            logged for logged in GAME_TYPES if logged.name == self.game_type)
+
+    @property
+    def moves(self) -> List:
+        decode = self.logged.decode
+        moves, offset = [], 0
+        while offset < len(self.encoded_moves):
+            number, offset = read_varint(self.encoded_moves, offset)
+            moves.append(decode(self.params, number))
+        return moves
+
+    def states(self) -> Iterator[GameState]:
+        """The starting state, and the state after each move"""
+        logged = self.logged
+        players = Player(self.names[0]), Player(self.names[1])
+        game = logged.new_game(logged.state_class, self.params, players)
+        yield game
+        for move in self.moves:
+            game = game.move(move)
+            yield game
+
+
+def _encode_record(code: int, params: Tuple[int, ...], seed: Optional[int],
+    names: Tuple[str, str], moves: bytes) -> bytes:
+    body = bytearray([code])
+    write_varint(body, len(params))
+    for param in params:
+        write_varint(body, param)
+    write_varint(body, 0 if seed is None else seed + 1)
+    for name in names:
+        encoded = name.encode()
+        write_varint(body, len(encoded))
+        body += encoded
+    body += moves
+    record = bytearray()
+    write_varint(record, len(body))
+    return bytes(record + body)
+
+def _decode_record(body: bytes) -> GameRecord:
+    code = body[0]
+    count, offset = read_varint(body, 1)
+    params = []
+    for _ in range(count):
+        param, offset = read_varint(body, offset)
+        params.append(param)
+    seed, offset = read_varint(body, offset)
+    names = []
+    for _ in range(2):
+        length, offset = read_varint(body, offset)
+        names.append(body[offset:offset + length].decode())
+        offset += length
+    return GameRecord(GAME_TYPES[code].name, tuple(params),
+        None if seed == 0 else seed - 1, tuple(names), bytes(body[offset:]))
+
+
+class GameLogWriter:
+    """Appends games to the log at path. Call start() with the starting
+    state of each game, and pass on_move to the loop playing it. start
+    raises a ValueError for a state its game's params can't rebuild,
+    such as one partway through a game, as the log couldn't replay it. A
+    game's record is made as the next game starts, or on flush(), and
+    records are written once buffer_size bytes of them are held.
+
+    Every write is of whole records to a file opened for appending, so
+    processes may log to the same file at once."""
+
+    def __init__(self, path: str, buffer_size: int = 1 << 16) -> None:
+        self.path = path
+        self.buffer_size = buffer_size
+        self.games = 0
+        self._buffer = bytearray()
+        self._file = open(path, 'ab', buffering=0)
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._game = None
+
+    def start(self, game: GameState, seed: Optional[int] = None) -> None:
+        self._finish()
+        code, logged = logged_game(game)
+        players = game.players
+        params = logged.params(game)
+        if logged.new_game(type(game), params, players) != game:
+            raise ValueError('Only games from their starting state can be '
+                'logged')
+        self._game = (code, params, seed, (players[0].name, players[1].name))
+        self._encode = logged.encode
+        self._moves = bytearray()
+
+    def on_move(self, player: Player, move, game: GameState) -> None:
+        write_varint(self._moves, self._encode(self._game[1], move))
+
+    def _finish(self) -> None:
+        if self._game is None:
+            return
+        self._buffer += _encode_record(*self._game, self._moves)
+        self._game = None
+        self.games += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the records held, ending the game being logged"""
+        self._finish()
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> 'GameLogWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _check_header(header: bytes, path: str) -> None:
+    if len(header) < HEADER.size:
+        raise ValueError(f'{path} is not a game log')
+    magic, version = HEADER.unpack_from(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} game log')
+
+def _read_records(log: BinaryIO) -> Iterator[GameRecord]:
+    while True:
+        length = shift = 0
+        while True:
+            byte = log.read(1)
+            if not byte:
+                return
+            length |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+        body = log.read(length)
+        if len(body) < length:
+            return
+        yield _decode_record(body)
+
+def _map_records(data: mmap.mmap) -> Iterator[GameRecord]:
+    offset = HEADER.size
+    size = len(data)
+    with memoryview(data) as view:
+        while offset < size:
+            try:
+                length, start = read_varint(view, offset)
+            except IndexError:
+                return
+            offset = start + length
+            if offset > size:
+                return
+            yield _decode_record(view[start:offset].tobytes())
+
+def read_games(path: str, use_mmap: bool = False,
+    chunk_size: int = 1 << 20) -> Iterator[GameRecord]:
+    """Yields the games logged at path, reading chunk_size bytes of the
+    file at a time, or through a read-only memory map"""
+    with open(path, 'rb', buffering=chunk_size) as log:
+        _check_header(log.read(HEADER.size), path)
+        if not use_mmap:
+            yield from _read_records(log)
+        elif os.fstat(log.fileno()).st_size > HEADER.size:
+            with mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield from _map_records(data)
@@ -0,0 +1,317 @@
+"""The games that can be played, each by name, and the players for them
+
+GAMES is the one list of games, read by cli to play, self-play and
+solve them, by server to host them and by game_log to log them, and so
+a game has the same options and defaults wherever it is started. Its
+options are given as key=value strings:
+
+    ttt                          - none
+    mnk    width, height, k      - 7, 7 and 4, and reach, 1
+    nim    count, takes          - 13 and 1,2,3
+    heaps  counts, takes         - 3,5,7 and any number
+
+A game's place in GAMES is its code in a game log, so new games go at
+the end. Each entry only imports the modules it needs as it is used, so
+reading the list doesn't load any game that isn't played.
+"""
+
+from collections import namedtuple
+from collections.abc import Callable
+
+# How to start, show, solve and log one game:
+#   help           - a line on it and its options
+#   names          - the names of its players
+#   new_game       - new_game(players, options)
+#   human          - human(name) to play it by hand, or None if it can't be
+#   computer       - the name of the player a person plays against
+#   solve          - solve(options, directory to export to or None)
+#   parse_move, format_move
+#                  - read and write a move as text, or None if it can't be
+#                    played by hand
+#   render         - render(game), the board as one line of text
+#   random_move    - random_move(render(game)), any legal move as text
+#   module, class_name
+#                  - where the class of its states is
+#   params         - params(game), the whole numbers that, with the
+#                    players, make its starting state
+#   from_params    - from_params(class, params, players)
+#   encode, decode - a move to and from a whole number, given the params
+Game = namedtuple('Game', ('help', 'names', 'new_game', 'human',
+    'computer', 'solve', 'parse_move', 'format_move', 'render',
+    'random_move', 'module', 'class_name', 'params', 'from_params',
+    'encode', 'decode'))
+
+# The most squares of an mnk board that solve takes on. Every position
+# is solved, and 3x4 takes seconds but 4x4 takes minutes.
+MOST_SOLVED_SQUARES = 16
+
+
+def _numbers(entry: str) -> tuple[int, ...]:
+    """Reads an option such as 1,2,3"""
+    return tuple(int(number) for number in entry.split(','))
+
+def _stand_ins(names: tuple[str, str]) -> tuple:
+    from engine import Player
+    return Player(names[0]), Player(names[1])
+
+def _export(game, directory: str) -> None:
+    from export import export
+    paths = export(game, directory)
+    print(f'Wrote {len(paths)} files to {directory}')
+
+def _render_grid(width: int, height: int, x: int, o: int) -> str:
+    """The rows of a bitboard grid, with . for a blank, split by /"""
+    return '/'.join(
+        ''.join(
+            'X' if x >> square & 1 else 'O' if o >> square & 1 else '.'
+            for square in range(row * width, (row + 1) * width)
+        )
+        for row in range(height)
+    )
+
+def _random_grid_move(board: str) -> str:
+    import random
+    rows = board.split('/')
+    blanks = [
+        (row, col)
+        for row, marks in enumerate(rows)
+        for col, mark in enumerate(marks)
+        if mark == '.'
+    ]
+    row, col = random.choice(blanks)
+    return f"{chr(ord('A') + col)}{row + 1}"
+
+
+def _new_ttt(players, options):
+    from ttt_engin import TicTacToeGrid
+    return TicTacToeGrid(players=players)
+
+def _human_ttt(name: str):
+    from ttt_engin import HumanTTT
+    return HumanTTT(name)
+
+def _solve_ttt(options, directory):
+    if directory is not None:
+        _export(_new_ttt(_stand_ins(('X', 'O')), options), directory)
+        return
+    from solved_table import TABLE_PATH, build
+    path = options.get('path', TABLE_PATH)
+    print(f'Wrote {build(path)} positions to {path}')
+
+def _parse_ttt(entry: str):
+    from ttt_engin import parse_position
+    return parse_position(entry)
+
+def _format_ttt(position) -> str:
+    from ttt_engin import format_position
+    return format_position(position)
+
+
+def _new_mnk(players, options):
+    from mnk import MNKGrid
+    return MNKGrid(int(options.get('width', 7)),
+        int(options.get('height', 7)), int(options.get('k', 4)),
+        players=players, reach=int(options.get('reach', 1)))
+
+def _human_mnk(name: str):
+    from mnk import HumanMNK
+    return HumanMNK(name)
+
+def _solve_mnk(options, directory):
+    missing = [key for key in ('width', 'height', 'k') if key not in options]
+    if missing:
+        raise ValueError(f"Give the {', '.join(missing)} of the mnk board "
+            f"to solve")
+    game = _new_mnk(_stand_ins(('X', 'O')), options)
+    if game.squares > MOST_SOLVED_SQUARES:
+        raise ValueError(f'Only mnk boards of up to {MOST_SOLVED_SQUARES} '
+            f'squares can be solved, not {game.squares}')
+    if directory is not None:
+        _export(game, directory)
+        return
+    from export import solved_positions
+    from mnk import format_position
+    positions = solved_positions(game)
+    x, o, value, best = next(positions)
+    positions.close()
+    moves = [
+        format_position(divmod(square, game.width))
+        for square in range(game.squares)
+        if best >> square & 1
+    ]
+    print(f"Value {value} for the player to move, best moves "
+        f"{', '.join(moves) or 'none'}")
+
+def _parse_mnk(entry: str):
+    from mnk import parse_position
+    return parse_position(entry)
+
+def _format_mnk(position) -> str:
+    from mnk import format_position
+    return format_position(position)
+
+def _mnk_from_params(cls, params, players):
+    width, height, k, reach = params
+    return cls(width, height, k, players=players, reach=reach)
+
+
+def _new_nim(players, options):
+    from sim_nim import Pot
+    count = int(options.get('count', 13))
+    if count < 1:
+        raise ValueError('The pot needs at least one token')
+    return Pot(count, players, _numbers(options.get('takes', '1,2,3')))
+
+def _human_nim(name: str):
+    from sim_nim import HumanNim
+    return HumanNim(name)
+
+def _solve_nim(options, directory):
+    from sim_nim import LOSS, WIN, solve_pot
+    pot = _new_nim(_stand_ins(('A', 'B')), options)
+    values = solve_pot(pot.takes)
+    result = {LOSS: 'loss', WIN: 'win'}.get(values[pot.count], 'draw')
+    print(f'A pot of {pot.count} is a {result} for the player to move; '
+        f'results repeat every {values.period} tokens')
+
+def _parse_take(entry: str) -> int:
+    if not entry.strip().isdigit():
+        raise ValueError('Take a number of tokens')
+    return int(entry)
+
+def _render_pot(pot) -> str:
+    """The count, then the takes, such as 13/1,2,3"""
+    return f"{pot.count}/{','.join(map(str, pot.takes))}"
+
+def _random_take(board: str) -> str:
+    import random
+    count, takes = board.split('/')
+    return random.choice(
+        [take for take in takes.split(',') if int(take) <= int(count)])
+
+
+def _new_heaps(players, options):
+    from sim_nim import Heaps
+    takes = options.get('takes')
+    return Heaps(_numbers(options.get('counts', '3,5,7')), players,
+        None if takes is None else _numbers(takes))
+
+def _solve_heaps(options, directory):
+    from sim_nim import grundy
+    heaps = _new_heaps(_stand_ins(('A', 'B')), options)
+    total = 0
+    for count in heaps.counts:
+        total ^= grundy(count, heaps.takes)
+    print(f"Heaps of {', '.join(map(str, heaps.counts))} have Grundy "
+        f"number {total}, a {'win' if total else 'loss'} for the player "
+        f"to move")
+
+def _heaps_params(game) -> tuple[int, ...]:
+    return (len(game.counts), *game.counts, *(game.takes or ()))
+
+def _heaps_from_params(cls, params, players):
+    heaps = params[0]
+    return cls(params[1:1 + heaps], players, params[1 + heaps:] or None)
+
+
+GAMES: dict[str, Game] = {
+    'ttt': Game('3x3 tic-tac-toe', ('X', 'O'), _new_ttt, _human_ttt,
+        'table', _solve_ttt, _parse_ttt, _format_ttt,
+        render=lambda grid: _render_grid(3, 3, grid.x, grid.o),
+        random_move=_random_grid_move,
+        module='ttt_engin', class_name='TicTacToeGrid',
+        params=lambda game: (),
+        from_params=lambda cls, params, players: cls(players=players),
+        encode=lambda params, move: move[0] * 3 + move[1],
+        decode=lambda params, number: divmod(number, 3)),
+    'mnk': Game('k in a row on a board of options width and height',
+        ('X', 'O'), _new_mnk, _human_mnk, 'deepening', _solve_mnk,
+        _parse_mnk, _format_mnk,
+        render=lambda grid: _render_grid(grid.width, grid.height,
+            grid.x, grid.o),
+        random_move=_random_grid_move,
+        module='mnk', class_name='MNKGrid',
+        params=lambda game: (game.width, game.height, game.k, game.reach),
+        from_params=_mnk_from_params,
+        encode=lambda params, move: move[0] * params[0] + move[1],
+        decode=lambda params, number: divmod(number, params[0])),
+    'nim': Game('Nim from a pot of count tokens, with takes',
+        ('A', 'B'), _new_nim, _human_nim, 'solved', _solve_nim,
+        _parse_take, str,
+        render=_render_pot,
+        random_move=_random_take,
+        module='sim_nim', class_name='Pot',
+        params=lambda game: (game.count, *game.takes),
+        from_params=lambda cls, params, players:
+            cls(params[0], players, params[1:]),
+        encode=lambda params, take: take,
+        decode=lambda params, take: take),
+    'heaps': Game('Nim on heaps of counts tokens, with takes',
+        ('A', 'B'), _new_heaps, None, 'grundy', _solve_heaps, None, None,
+        render=lambda heaps: ','.join(map(str, heaps.counts)),
+        random_move=None,
+        module='sim_nim', class_name='Heaps',
+        params=_heaps_params,
+        from_params=_heaps_from_params,
+        encode=lambda params, move: move[1] * params[0] + move[0],
+        decode=lambda params, number: divmod(number, params[0])[::-1]),
+}
+
+
+def _human(name: str, game: str, time_limit: float):
+    if GAMES[game].human is None:
+        raise ValueError(f'{game} can not be played by hand')
+    return GAMES[game].human(name)
+
+def _dumb(name: str, game: str, time_limit: float):
+    if game == 'nim':
+        from sim_nim import ComputerNimDumb as DumbComputer
+    else:
+        from engine import DumbComputer
+    return DumbComputer(name)
+
+def _smart(name: str, game: str, time_limit: float):
+    if game == 'nim':
+        from sim_nim import ComputerNimSmart as SmartComputer
+    else:
+        from engine import SmartComputer
+    return SmartComputer(name)
+
+def _deepening(name: str, game: str, time_limit: float):
+    from deepening import DeepeningComputer
+    return DeepeningComputer(name, time_limit=time_limit)
+
+def _mcts(name: str, game: str, time_limit: float):
+    from mcts import MCTSComputer
+    return MCTSComputer(name, playouts=None, time_limit=time_limit)
+
+def _table(name: str, game: str, time_limit: float):
+    if game != 'ttt':
+        raise ValueError('The solved table only plays ttt')
+    from solved_table import TableComputer
+    return TableComputer(name)
+
+def _solved(name: str, game: str, time_limit: float):
+    if game != 'nim':
+        raise ValueError('The solved player only plays nim')
+    from sim_nim import ComputerNimSolved
+    return ComputerNimSolved(name)
+
+def _grundy(name: str, game: str, time_limit: float):
+    if game != 'heaps':
+        raise ValueError('The grundy player only plays heaps')
+    from sim_nim import ComputerNimGrundy
+    return ComputerNimGrundy(name)
+
+# Each is given the player's name, the game's and the seconds it may
+# think for each move
+PLAYERS: dict[str, Callable[[str, str, float], object]] = {
+    'human': _human,
+    'dumb': _dumb,
+    'smart': _smart,
+    'deepening': _deepening,
+    'mcts': _mcts,
+    'table': _table,
+    'solved': _solved,
+    'grundy': _grundy,
+}
@@ -0,0 +1,205 @@
+"""Monte Carlo tree search, for games too large to search to the end
+
+Each playout walks down the tree by UCT, adds one new position to it,
+plays random moves from there to the end of the game, and counts the
+result for every position on the way down. The move played is the one
+searched the most. Only legal_moves, move, won, tie and score are used,
+so any GameState can be played.
+"""
+
+from math import log, sqrt
+import random
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+from engine import ComputerPlayer, GameState
+
+
+def outcome(game: GameState, player) -> float:
+    """1 for a win for player, 0 for a loss and 1/2 for a tie"""
+    score = game.score(player)
+    return 1.0 if score > 0 else 0.0 if score < 0 else 0.5
+
+
+class Node:
+    """A position in the search tree. reward is the total result of the
+    playouts through it for the player who moved into it."""
+
+    __slots__ = ('state', 'parent', 'move', 'children', 'untried',
+        'visits', 'reward')
+
+    def __init__(self, state: GameState, parent: 'Node' = None,
+        move=None) -> None:
+        self.state = state
+        self.parent = parent
+        self.move = move
+        self.children: List[Node] = []
+        if state.won:
+            self.untried = []
+        else:
+            self.untried = list(state.legal_moves)
+            random.shuffle(self.untried)
+        self.visits = 0
+        self.reward = 0.0
+
+    def select(self, exploration: float) -> 'Node':
+        """The child with the highest upper confidence bound"""
+        log_visits = log(self.visits)
+        return max(self.children, key=lambda child:
+            child.reward / child.visits
+            + exploration * sqrt(log_visits / child.visits))
+
+    def expand(self) -> 'Node':
+        move = self.untried.pop()
+        child = Node(self.state.move(move), self, move)
+        self.children.append(child)
+        return child
+
+
+def playout(game: GameState) -> GameState:
+    """Plays random moves to the end of the game"""
+    while not game.won:
+        moves = list(game.legal_moves)
+        if not moves:
+            break
+        game = game.move(random.choice(moves))
+    return game
+
+def search(root: Node, playouts: Optional[int] = None,
+    time_limit: Optional[float] = None, exploration: float = sqrt(2)
+) -> int:
+    """Runs playouts from root until either budget is spent, and
+    returns how many were run"""
+    deadline = None if time_limit is None else perf_counter() + time_limit
+    count = 0
+    while ((playouts is None or count < playouts)
+        and (deadline is None or perf_counter() < deadline)):
+        node = root
+        while not node.untried and node.children:
+            node = node.select(exploration)
+        if node.untried:
+            node = node.expand()
+        end = playout(node.state)
+        first, second = end.players
+        results = outcome(end, first), outcome(end, second)
+        while node is not None:
+            node.visits += 1
+            if node.parent is not None:
+                mover = node.parent.state.current_player
+                node.reward += results[0] if mover is first else results[1]
+            node = node.parent
+        count += 1
+    return count
+
+def _root_visits(game: GameState, playouts: Optional[int],
+    time_limit: Optional[float], exploration: float, seed: int
+) -> Dict[Any, Tuple[int, float]]:
+    """Searches a tree of its own in a worker process, and returns the
+    visits and reward of each move from the root"""
+    random.seed(seed)
+    root = Node(game)
+    search(root, playouts, time_limit, exploration)
+    return {
+        child.move: (child.visits, child.reward)
+        for child in root.children
+    }
+
+
+class SearchTree:
+    """The tree an MCTSComputer keeps between moves. A tree sent to
+    another process by pickling arrives there empty."""
+
+    def __init__(self) -> None:
+        self.root: Optional[Node] = None
+        self.playouts = 0
+        self.seconds = 0.0
+
+    def __reduce__(self):
+        return SearchTree, ()
+
+    def find(self, game: GameState) -> Node:
+        """The node for game, from the last search if it is at most two
+        moves on from the last root, or else a new one"""
+        if self.root is not None:
+            if self.root.state == game:
+                return self.root
+            for child in self.root.children:
+                for node in (child, *child.children):
+                    if node.state == game:
+                        node.parent = None
+                        return node
+        return Node(game)
+
+
+class MCTSComputer(ComputerPlayer):
+    """Chooses moves by Monte Carlo tree search, running playouts for
+    each move, or searching for time_limit seconds, or whichever runs
+    out first when given both. Raises a ValueError if given neither.
+    The tree is kept for the next move.
+
+    With more than one worker, the playouts are split across that many
+    processes, each growing a tree of its own, and their visits to the
+    root moves are added up. Trees aren't kept between moves then."""
+
+    fields = ('name', 'speed', 'playouts', 'time_limit', 'exploration',
+        'workers')
+
+    def __init__(self, name: str = 'I', speed: float = 0.0,
+        playouts: Optional[int] = 1000, time_limit: Optional[float] = None,
+        exploration: float = sqrt(2), workers: int = 1,
+        tree: SearchTree = None) -> None:
+        if playouts is None and time_limit is None:
+            raise ValueError('Give MCTSComputer playouts, a time_limit or '
+                'both, or it would search forever')
+        super().__init__(name, speed)
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.workers = workers
+        self.tree = SearchTree() if tree is None else tree
+
+    def inteligent_moves(self, game: GameState) -> List:
+        start = perf_counter()
+        if self.workers > 1:
+            visits = self.parallel_visits(game)
+        else:
+            root = self.tree.find(game)
+            self.tree.playouts = search(root, self.playouts,
+                self.time_limit, self.exploration)
+            self.tree.root = root
+            visits = {child.move: child.visits for child in root.children}
+        self.tree.seconds = perf_counter() - start
+        if not visits:
+            # No playout finished in time, so any move will do
+            return list(game.legal_moves)
+        most = max(visits.values())
+        return [move for move, count in visits.items() if count == most]
+
+    def parallel_visits(self, game: GameState) -> Dict[Any, int]:
+        from concurrent.futures import ProcessPoolExecutor
+
+        playouts = None
+        if self.playouts is not None:
+            playouts = -(-self.playouts // self.workers)
+        visits: Dict[Any, int] = {}
+        self.tree.root = None
+        self.tree.playouts = 0
+        with ProcessPoolExecutor(self.workers) as pool:
+            tasks = [
+                pool.submit(_root_visits, game, playouts, self.time_limit,
+                    self.exploration, random.getrandbits(64))
+                for _ in range(self.workers)
+            ]
+            for task in tasks:
+                for move, (count, reward) in task.result().items():
+                    visits[move] = visits.get(move, 0) + count
+                    self.tree.playouts += count
+        return visits
+
+
+if __name__ == '__main__':
+    import engine
+    from mnk import MNKGrid
+
+    players = (MCTSComputer('X', playouts=None, time_limit=1),
+        MCTSComputer('O', playouts=None, time_limit=1))
+    engine.play_engine(MNKGrid(7, 7, 4, players=players, reach=1))
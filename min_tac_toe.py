@@ -1,10 +1,12 @@
 from dataclasses import dataclass
-from functools import cache, cached_property
+from functools import cached_property
 from random import choice, random
 import re
 import textwrap
 import time
-from typing import Any, List, Tuple
+from typing import Any, Collection, List, Set, Tuple
+from search_cache import GAME, cached
+from symmetry import canonical
 
 class GameState:
     """Parent class for the current state of many possible games"""
@@ -15,11 +17,35 @@ class GameState:
     
     win_on_my_turn = False
 
+    @property
+    def winning_moves(self) -> Collection:
+        """Moves that win the game for the player to move"""
+        return {
+            move
+            for move, next_state in self.possible_moves
+            if next_state.won and not next_state.win_on_my_turn
+        }
+
+    @property
+    def threat_moves(self) -> Collection:
+        """Moves that would win the game for the player who is not to 
+        move, if it were their turn"""
+        return ()
+
+    def static_priority(self, move) -> int:
+        """How promising a move looks before searching it"""
+        return 0
+
     def move(self, var) -> 'GameState':
         """Performs a move, if valid, and returns the game's state as 
         a new instance"""
         ...
 
+    @property
+    def canonical(self) -> 'GameState':
+        """An equivalent state that stands in for this one in caches"""
+        return self
+
     @property
     def possible_moves(self) -> List[Tuple[Any, "GameState"]]:
         """Returns a discription of the move and the new GameState 
@@ -70,6 +96,33 @@ class TicTacToeGrid(GameState):
     def potential_moves(self):
         return [(row, col) for row in range(3) for col in range(3)]
 
+    @property
+    def threat_moves(self) -> Set[Tuple[int, int]]:
+        x_count = self.matrix.count('X')
+        o_count = self.matrix.count('O')
+        theirs = 'O' if x_count == o_count else 'X'
+        threats = set()
+        for combo in TicTacToe_WINNING_COMBOS:
+            marks = [self.matrix[row * 3 + col] for row, col in combo]
+            if marks.count(theirs) == 2 and ' ' in marks:
+                threats.add(combo[marks.index(' ')])
+        return threats
+
+    def static_priority(self, position: Tuple[int, int]) -> int:
+        """The center is worth most, then the corners, then the edges"""
+        row, col = position
+        if (row, col) == (1, 1):
+            return 2
+        elif row != 1 and col != 1:
+            return 1
+        else:
+            return 0
+
+    @cached_property
+    def canonical(self) -> 'TicTacToeGrid':
+        """The rotation or reflection of the grid that sorts first"""
+        return TicTacToeGrid(''.join(canonical(self.matrix, 3)[0]))
+
     @cached_property
     def possible_moves(self) -> List[Tuple[Any, GameState]]:
         x_count = self.matrix.count('X')
@@ -116,6 +169,7 @@ def grid_input(prompt: str) -> Tuple[int, int]:
 
 def play_tictactoe():
     grid = TicTacToeGrid()
+    _minimax.new_game()
     print_grid(grid)
 
     while not grid.won and not grid.tie:
@@ -143,8 +197,11 @@ def play_tictactoe():
             if grid.won:
                 print('O wins')
 
-@cache
 def minimax(game: GameState, my_turn: bool) -> int:
+    return _minimax(game.canonical, my_turn)
+
+@cached(maxsize=1 << 16, scope=GAME)
+def _minimax(game: GameState, my_turn: bool) -> int:
     if game.won:
         if game.win_on_my_turn:
             return 1 if my_turn else -1
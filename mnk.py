@@ -0,0 +1,276 @@
+"""The m,n,k-game: get k in a row on a board of any width and height
+
+Tic-tac-toe is the 3,3,3-game, and gomoku is played as the 15,15,5-game.
+The board is held as two bitboards like ttt_engin.TicTacToeGrid, with
+bit (row * width + col) for the square at (row, col).
+"""
+
+from collections.abc import Hashable
+from functools import cache
+import re
+from string import ascii_uppercase
+from deepening import line_balance
+from engine import ByFields, GameState, Player
+from symmetry import canonical_bits
+from zobrist import board_keys, smallest_key, symmetric_keys
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+@cache
+def lines(width: int, height: int, k: int) -> tuple[int, ...]:
+    """Returns a mask for every line of k squares on the board"""
+    masks = []
+    for row in range(height):
+        for col in range(width):
+            for row_step, col_step in DIRECTIONS:
+                end_row = row + row_step * (k - 1)
+                end_col = col + col_step * (k - 1)
+                if 0 <= end_row < height and 0 <= end_col < width:
+                    masks.append(sum(
+                        1 << ((row + row_step * n) * width
+                            + col + col_step * n)
+                        for n in range(k)
+                    ))
+    return tuple(masks)
+
+@cache
+def _edge_masks(width: int, height: int) -> tuple[int, int, int]:
+    """Masks of the whole board, and of it without its first column,
+    and without its last column"""
+    full = (1 << width * height) - 1
+    first_col = sum(1 << row * width for row in range(height))
+    last_col = first_col << (width - 1)
+    return full, full & ~first_col, full & ~last_col
+
+
+def _zobrist_game(k: int, reach: int) -> str:
+    """What a board's Zobrist numbers are drawn for. Boards won by a
+    different k, or searched with a different reach, score differently,
+    so they don't share keys."""
+    return f'mnk{k}:{reach}'
+
+
+class MNKGrid(GameState, ByFields):
+    """A width x height board, won by k in a row. With a reach, moves
+    are only considered within that many squares of a square already
+    taken, which keeps searches of large boards manageable.
+
+    Like ttt_engin.TicTacToeGrid, whether the board is won and its hash
+    are kept in slots as it is made, and its cache_key once asked for,
+    and keys packs the Zobrist keys of its symmetries."""
+
+    __slots__ = ('width', 'height', 'k', 'x', 'o', 'last', 'players',
+        'reach', 'keys', 'won', '_hash', '_cache_key')
+
+    fields = ('width', 'height', 'k', 'x', 'o', 'last', 'players', 'reach')
+
+    def __init__(self, width: int = 3, height: int = 3, k: int = 3,
+        x: int = 0, o: int = 0, last: int = -1,
+        players: tuple[Player, Player] = (), reach: int = 0,
+        keys: int | None = None) -> None:
+        self.width = width
+        self.height = height
+        self.k = k
+        self.x = x
+        self.o = o
+        self.last = last
+        self.players = players
+        self.reach = reach
+        if keys is None:
+            keys = board_keys((x, o), height, width, _zobrist_game(k, reach))
+        self.keys = keys
+        self.won = self._find_win()
+        self._hash = hash((x, o))
+        self._cache_key = None
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    @property
+    def squares(self) -> int:
+        return self.width * self.height
+
+    @property
+    def potential_moves(self) -> list[tuple[int, int]]:
+        taken = self.x | self.o
+        if not self.reach:
+            candidates = ~taken
+        elif not taken:
+            candidates = 1 << (self.height // 2 * self.width
+                + self.width // 2)
+        else:
+            full, not_first, not_last = _edge_masks(self.width, self.height)
+            near = taken
+            for _ in range(self.reach):
+                near |= (near << 1 & not_first) | (near >> 1 & not_last)
+                near |= near << self.width | near >> self.width
+                near &= full
+            candidates = near & ~taken
+        return [
+            divmod(square, self.width)
+            for square in range(self.squares)
+            if candidates >> square & 1
+        ]
+
+    def move(self, position: tuple[int, int]) -> 'MNKGrid':
+        row, col = position
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise ValueError
+        square = row * self.width + col
+        bit = 1 << square
+        if (self.x | self.o) & bit:
+            raise ValueError
+        x, o = self.x, self.o
+        if x.bit_count() == o.bit_count():
+            x |= bit
+            mark = 0
+        else:
+            o |= bit
+            mark = 1
+        return MNKGrid(self.width, self.height, self.k, x, o, square,
+            self.next_players, self.reach,
+            self.keys ^ self.key_tables[square][mark])
+
+    def is_legal(self, position: tuple[int, int]) -> bool:
+        row, col = position
+        return (0 <= row < self.height and 0 <= col < self.width
+            and not (self.x | self.o) >> (row * self.width + col) & 1)
+
+    def _find_win(self) -> bool:
+        """Checks only the lines through the last move"""
+        if self.last < 0:
+            return False
+        board = self.x if self.x >> self.last & 1 else self.o
+        row, col = divmod(self.last, self.width)
+        for row_step, col_step in DIRECTIONS:
+            in_a_row = 1
+            for sign in (1, -1):
+                r, c = row + sign * row_step, col + sign * col_step
+                while (in_a_row < self.k
+                    and 0 <= r < self.height and 0 <= c < self.width
+                    and board >> (r * self.width + c) & 1):
+                    in_a_row += 1
+                    r, c = r + sign * row_step, c + sign * col_step
+            if in_a_row >= self.k:
+                return True
+        return False
+
+    @property
+    def blanks(self) -> int:
+        return self.squares - (self.x | self.o).bit_count()
+
+    def score(self, player):
+        if self.won:
+            if player is not self.current_player:
+                return 1 + self.blanks
+            else:
+                return -(1 + self.blanks)
+        elif self.tie:
+            return 0
+
+    def _boards(self, player) -> tuple[int, int]:
+        """The boards of player and of their opponent"""
+        if (self.x.bit_count() == self.o.bit_count()) == (
+            player is self.current_player):
+            return self.x, self.o
+        else:
+            return self.o, self.x
+
+    def evaluate(self, player) -> float:
+        mine, theirs = self._boards(player)
+        return line_balance(mine, theirs,
+            lines(self.width, self.height, self.k), self.k)
+
+    def _completing_moves(self, mine: int, theirs: int
+    ) -> set[tuple[int, int]]:
+        """The squares that finish a line for the player with the 
+        marks in theirs"""
+        moves = set()
+        for mask in lines(self.width, self.height, self.k):
+            if (theirs & mask).bit_count() == self.k - 1 and not mine & mask:
+                moves.add(divmod(
+                    (mask & ~theirs).bit_length() - 1, self.width))
+        return moves
+
+    @property
+    def winning_moves(self) -> set[tuple[int, int]]:
+        mine, theirs = self._boards(self.current_player)
+        return self._completing_moves(theirs, mine)
+
+    @property
+    def threat_moves(self) -> set[tuple[int, int]]:
+        mine, theirs = self._boards(self.current_player)
+        return self._completing_moves(mine, theirs)
+
+    def static_priority(self, position: tuple[int, int]) -> int:
+        """Squares nearer the center come first"""
+        row, col = position
+        return -(abs(2 * row - self.height + 1) + abs(2 * col - self.width + 1))
+
+    @property
+    def key_tables(self) -> tuple[tuple[int, ...], ...]:
+        """The packed Zobrist numbers of each mark on each square"""
+        return symmetric_keys(self.height, self.width, 2,
+            _zobrist_game(self.k, self.reach))
+
+    @property
+    def cache_key(self) -> int:
+        """The smallest Zobrist key of the board's symmetries"""
+        if self._cache_key is None:
+            self._cache_key = smallest_key(
+                self.keys, 8 if self.width == self.height else 4)
+        return self._cache_key
+
+    @property
+    def exact_key(self) -> Hashable:
+        return (self.width, self.height, self.k, self.reach) + canonical_bits(
+            (self.x, self.o), self.height, self.width)[0]
+
+    def display(self) -> None:
+        print('\033c', end='')
+        print('     ' + '   '.join(ascii_uppercase[:self.width]))
+        print('   ' + '-' * (4 * self.width))
+        for row in range(self.height):
+            marks = [
+                'X' if self.x >> square & 1
+                else 'O' if self.o >> square & 1
+                else ' '
+                for square in range(row * self.width, (row + 1) * self.width)
+            ]
+            if row:
+                print('   ┆ ' + '┼'.join(['───'] * self.width))
+            print(f'{row + 1:>2} ┆  ' + ' │ '.join(marks))
+        print()
+
+
+def parse_position(entry: str) -> tuple[int, int]:
+    """Reads a square written as C12 or 12C, as (row, col)"""
+    entry = entry.strip().upper()
+    match = (re.fullmatch('(?P<col>[A-Z])(?P<row>[0-9]+)', entry)
+        or re.fullmatch('(?P<row>[0-9]+)(?P<col>[A-Z])', entry))
+    if not match:
+        raise ValueError('Specify your move in the form of C12 or 12C')
+    return int(match['row']) - 1, ord(match['col']) - ord('A')
+
+def format_position(position: tuple[int, int]) -> str:
+    row, col = position
+    return f'{ascii_uppercase[col]}{row + 1}'
+
+class HumanMNK(Player):
+
+    def get_move(self, grid: MNKGrid) -> tuple[int, int]:
+        try:
+            return parse_position(input(f'Your turn, {self.name}:'))
+        except ValueError as error:
+            print(error)
+            raise
+
+
+if __name__ == '__main__':
+    import engine
+    from deepening import DeepeningComputer
+
+    players = (DeepeningComputer('X', time_limit=1),
+        DeepeningComputer('O', time_limit=1))
+    engine.play_engine(MNKGrid(15, 15, 5, players=players, reach=1))
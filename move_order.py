@@ -0,0 +1,76 @@
+"""Orders in which to search the moves from a position
+
+Alpha-beta search cuts off sooner when the best move is searched
+first. An ordering is given the legal moves of a position and returns
+them in the order to search them, without making any of them, so the
+states of moves that are cut off are never built. It is told about
+each move that caused a cutoff, so it can learn from them during a
+search.
+
+The heuristics rely on these GameState hooks:
+    winning_moves      - moves that win for the player to move
+    threat_moves       - moves that would win for the player not to
+                         move, so blocking them matters
+    static_priority()  - a fixed preference for a move, higher first
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+
+
+class MoveOrdering:
+    """Searches moves in the order the game lists them"""
+
+    def start(self) -> None:
+        """Called at the start of each search"""
+
+    def order(self, game, moves: Iterable,
+        ply: int | None = None) -> Iterable:
+        return moves
+
+    def cutoff(self, move, ply: int | None = None) -> None:
+        """Called when searching move caused a cutoff"""
+
+
+class HeuristicOrdering(MoveOrdering):
+    """Searches winning moves first, then moves that block the
+    opponent's wins, then killer moves that caused a cutoff elsewhere
+    at the same ply, then by how many cutoffs each move has caused in
+    this search, and finally by the game's static preference.
+
+    Killers are kept by ply. A caller that can't say which ply it is
+    searching shares a single set of killers across every ply."""
+
+    killers_per_ply = 2
+
+    def __init__(self) -> None:
+        self.killers: dict[int | None, list] = defaultdict(list)
+        self.history: dict[object, int] = defaultdict(int)
+
+    def start(self) -> None:
+        self.killers.clear()
+        self.history.clear()
+
+    def order(self, game, moves: Iterable,
+        ply: int | None = None) -> list:
+        wins = game.winning_moves
+        threats = game.threat_moves
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def priority(move) -> tuple:
+            return (
+                move in wins,
+                move in threats,
+                move in killers,
+                history.get(move, 0),
+                game.static_priority(move),
+            )
+        return sorted(moves, key=priority, reverse=True)
+
+    def cutoff(self, move, ply: int | None = None) -> None:
+        self.history[move] += 1
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killers_per_ply:]
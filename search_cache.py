@@ -0,0 +1,280 @@
+"""Caches for the results of game tree searches
+
+Every cache here holds its entries in least recently used order, and
+may be bounded in size. Each has a scope, which says when it is 
+emptied without being asked:
+
+    PROCESS - never, so it lasts as long as the process
+    SESSION - when a session() of it ends
+    GAME    - when a session ends, and when a new game starts
+
+Long running processes can find every cache still in use with 
+live_caches(), and ask each for its cache_info() and nbytes.
+"""
+
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import update_wrapper
+from itertools import chain, count
+import os
+import sys
+from collections.abc import Callable, Hashable, Iterator
+from weakref import WeakSet
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+PROCESS = 'process'
+SESSION = 'session'
+GAME = 'game'
+SCOPES = (PROCESS, SESSION, GAME)
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize evictions')
+
+_live: 'WeakSet[BoundedCache]' = WeakSet()
+
+def live_caches() -> list['BoundedCache']:
+    """Every cache in this process that is still in use"""
+    return list(_live)
+
+
+def _deep_size(thing, seen: set[int]) -> int:
+    """The bytes taken by thing and whatever it holds, leaving out 
+    anything in seen. Players and other caches aren't counted, since 
+    they belong to the game rather than to the cache."""
+    if id(thing) in seen:
+        return 0
+    seen.add(id(thing))
+    if (isinstance(thing, (BoundedCache, type))
+        or hasattr(thing, 'get_move')):
+        return 0
+    size = sys.getsizeof(thing)
+    if isinstance(thing, (str, bytes, int, float, complex)):
+        return size
+    elif isinstance(thing, dict):
+        held = chain(thing.keys(), thing.values())
+    elif isinstance(thing, (tuple, list, set, frozenset)):
+        held = iter(thing)
+    else:
+        held = chain(
+            getattr(thing, '__dict__', {}).values(),
+            (
+                getattr(thing, name)
+                for cls in type(thing).__mro__
+                for name in cls.__dict__.get('__slots__', ())
+                if hasattr(thing, name)
+            ))
+    return size + sum(_deep_size(item, seen) for item in held)
+
+
+class BoundedCache:
+    """Holds at most maxsize entries, or any number when maxsize is 
+    None. When full, the least recently used entry is evicted. The 
+    entries are also emptied as scope says."""
+
+    def __init__(self, maxsize: int | None = None, scope: str = PROCESS
+    ) -> None:
+        if scope not in SCOPES:
+            raise ValueError(f'scope must be one of {", ".join(SCOPES)}')
+        self.maxsize = maxsize
+        self.scope = scope
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _live.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _hold(self, key: Hashable, entry) -> None:
+        self._entries[key] = entry
+        if self.maxsize is not None:
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+
+    def _forget(self, key: Hashable) -> None:
+        """Called with each key that is evicted"""
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def new_game(self) -> None:
+        """Empties a cache scoped to a game"""
+        if self.scope == GAME:
+            self.clear()
+
+    @contextmanager
+    def session(self) -> Iterator['BoundedCache']:
+        """Empties the cache once the with block ends, unless it is 
+        scoped to the process"""
+        try:
+            yield self
+        finally:
+            if self.scope != PROCESS:
+                self.clear()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+            len(self._entries), self.evictions)
+
+    @property
+    def nbytes(self) -> int:
+        """About how many bytes the entries take. Every entry is walked,
+        so this takes time in proportion to the size of the cache."""
+        return _deep_size(self._entries, set())
+
+
+class SearchCache(BoundedCache):
+    """Caches the results of a search function, as functools.cache 
+    does, and like it has cache_clear, cache_info and __wrapped__"""
+
+    def __init__(self, function: Callable, maxsize: int | None = None,
+        scope: str = PROCESS) -> None:
+        super().__init__(maxsize, scope)
+        update_wrapper(self, function)
+
+    def __call__(self, *args, **kwargs):
+        key = args + (_KEYWORDS, *kwargs.items()) if kwargs else args
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            if self.maxsize is not None:
+                self._entries.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self.__wrapped__(*args, **kwargs)
+        self._hold(key, value)
+        return value
+
+    def cache_clear(self) -> None:
+        self.clear()
+
+    def warm_up(self, *args, **kwargs) -> None:
+        """Runs the search ahead of time, so that it and everything it 
+        searches are cached"""
+        self(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}({self.__qualname__}, '
+            f'size={len(self)}, maxsize={self.maxsize}, '
+            f'scope={self.scope!r})')
+
+# Keeps keyword arguments apart from positional ones in keys
+_KEYWORDS = object()
+_MISSING = object()
+
+def cached(maxsize: int | None = None, scope: str = PROCESS
+) -> Callable[[Callable], SearchCache]:
+    """Decorates a search function with a SearchCache"""
+    def decorate(function: Callable) -> SearchCache:
+        return SearchCache(function, maxsize, scope)
+    return decorate
+
+
+_table_ids = count()
+_received: dict[tuple[int, int], 'TranspositionTable'] = {}
+
+def _received_table(token: tuple[int, int], maxsize: int, backend=None,
+    debug: bool = False, scope: str = PROCESS) -> 'TranspositionTable':
+    """The table in this process standing in for the table token names
+    in the process that sent it"""
+    if token not in _received:
+        _received[token] = TranspositionTable(maxsize, backend, debug, scope)
+    return _received[token]
+
+
+class KeyCollision(Exception):
+    """Two different positions were looked up under the same key"""
+
+
+class TranspositionTable(BoundedCache):
+    """Stores the value found for a position along with whether it is
+    exact, or only a lower or upper bound, because the search that
+    found it was cut off by its alpha-beta window.
+
+    Holds at most maxsize positions, as a BoundedCache.
+
+    A table sent to another process by pickling arrives there empty,
+    and every copy of the same table sent to one process is a single
+    table there, so the searches a worker process runs for one player
+    share what they find.
+
+    Given a backend, such as a disk_cache.DiskCache, positions that 
+    aren't held are looked up in it, and every position stored is 
+    stored in it too. misses then counts the positions found in 
+    neither. A table sent to another process takes its backend along.
+
+    In debug mode, the table keeps the position each key was first 
+    probed for, and raises KeyCollision when the key is probed for a 
+    different one. It is for keys that may collide, such as Zobrist 
+    keys, and costs the time and memory to keep the positions."""
+
+    def __init__(self, maxsize: int | None = 1 << 16, backend=None,
+        debug: bool = False, scope: str = PROCESS) -> None:
+        super().__init__(maxsize, scope)
+        self.backend = backend
+        self.debug = debug
+        self._positions: dict[Hashable, Hashable] = {}
+        self._token = os.getpid(), next(_table_ids)
+        self.backend_hits = 0
+
+    def probe(self, key: Hashable, position: Hashable = None
+    ) -> tuple[object, int] | None:
+        """Returns the (value, flag) stored for key, or None. In debug 
+        mode, position is what the key stands for."""
+        if self.debug and position is not None:
+            known = self._positions.setdefault(key, position)
+            if known != position:
+                raise KeyCollision(
+                    f'{key!r} stands for both {known!r} and {position!r}')
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            if self.maxsize is not None:
+                self._entries.move_to_end(key)
+            return entry
+        if self.backend is not None:
+            entry = self.backend.get(key)
+            if entry is not None:
+                self.backend_hits += 1
+                self._hold(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: Hashable, value, flag: int) -> None:
+        self._hold(key, (value, flag))
+        if self.backend is not None:
+            self.backend.put(key, value, flag)
+
+    def flush(self) -> None:
+        """Writes any positions the backend is holding back"""
+        if self.backend is not None:
+            self.backend.flush()
+
+    def _forget(self, key: Hashable) -> None:
+        self._positions.pop(key, None)
+
+    def clear(self) -> None:
+        """Empties the table in memory, leaving its backend alone"""
+        super().clear()
+        self._positions.clear()
+        self.backend_hits = 0
+
+    def __reduce__(self):
+        return _received_table, (self._token, self.maxsize, self.backend,
+            self.debug, self.scope)
+
+    def __repr__(self) -> str:
+        backend = '' if self.backend is None else (
+            f', backend_hits={self.backend_hits}')
+        return (f'{type(self).__name__}(size={len(self)}, '
+            f'maxsize={self.maxsize}, hits={self.hits}, '
+            f'misses={self.misses}, evictions={self.evictions}{backend}, '
+            f'scope={self.scope!r})')
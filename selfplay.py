@@ -0,0 +1,144 @@
+"""Headless self-play, for running many games between computer players"""
+
+import os
+import random
+import time
+from collections.abc import Callable, Sequence
+from engine import ComputerPlayer, GameState, Player
+
+
+class SelfPlayResults:
+    """Totals for a series of games, with each count listed by seat,
+    in the order the players take turns"""
+
+    def __init__(self, names: tuple[str, str]) -> None:
+        self.names = names
+        self.wins = [0, 0]
+        self.losses = [0, 0]
+        self.ties = self.games = self.moves = 0
+        self.seconds = 0.0
+
+    @property
+    def average_length(self) -> float:
+        return self.moves / self.games if self.games else 0.0
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def add(self, other: 'SelfPlayResults') -> None:
+        for seat in (0, 1):
+            self.wins[seat] += other.wins[seat]
+            self.losses[seat] += other.losses[seat]
+        self.ties += other.ties
+        self.games += other.games
+        self.moves += other.moves
+
+    def __str__(self) -> str:
+        lines = [
+            f'{name}: {self.wins[seat]} wins, {self.losses[seat]} losses'
+            for seat, name in enumerate(self.names)
+        ]
+        lines.append(f'{self.ties} ties')
+        lines.append(f'{self.games} games, '
+            f'{self.average_length:.1f} moves per game, '
+            f'{self.games_per_second:,.1f} games/sec')
+        return '\n'.join(lines)
+
+
+def play_headless(game: GameState,
+    on_move: Callable[[Player, object, GameState], None] = None
+) -> tuple[Player | None, int]:
+    """Plays one game to the end without displaying it or pausing.
+    Returns the winner, or None for a tie, and the number of moves.
+    on_move is called after each move, as by engine.play_engine."""
+    players = game.players
+    for player in players:
+        player.new_game(game)
+    moves = 0
+    while not game.won and not game.tie:
+        player = game.current_player
+        try:
+            if isinstance(player, ComputerPlayer):
+                move = random.choice(player.inteligent_moves(game))
+            else:
+                move = player.get_move(game)
+            game = game.move(move)
+        except ValueError:
+            continue
+        moves += 1
+        if on_move is not None:
+            on_move(player, move, game)
+    if game.won:
+        return max(players, key=game.score), moves
+    else:
+        return None, moves
+
+def _play_games(game: GameState, seeds: Sequence[int | None],
+    log: str | None = None) -> SelfPlayResults:
+    players = game.players
+    results = SelfPlayResults((players[0].name, players[1].name))
+    writer = None
+    if log is not None:
+        from game_log import GameLogWriter
+        writer = GameLogWriter(log)
+    for seed in seeds:
+        if seed is not None:
+            random.seed(seed)
+        if writer is not None:
+            writer.start(game, seed)
+        winner, moves = play_headless(game,
+            None if writer is None else writer.on_move)
+        if winner is None:
+            results.ties += 1
+        else:
+            seat = 0 if winner is players[0] else 1
+            results.wins[seat] += 1
+            results.losses[1 - seat] += 1
+        results.games += 1
+        results.moves += moves
+    if writer is not None:
+        writer.close()
+    return results
+
+def self_play(game: GameState, games: int = 100, workers: int = None,
+    seed: int = None, log: str = None) -> SelfPlayResults:
+    """Plays games from the starting state, spread over a pool of
+    worker processes. The game and its players must be picklable. With
+    a seed, every game is seeded in turn from it, so the results are
+    repeatable. workers=1 plays in this process. Given a log, every 
+    game is appended to the game_log there, with its seed."""
+    workers = workers or os.cpu_count() or 1
+    seeds = [None if seed is None else seed + n for n in range(games)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = _play_games(game, seeds, log)
+    else:
+        # Only needed with more than one worker, and slow to import
+        from concurrent.futures import ProcessPoolExecutor
+
+        if log is not None:
+            from game_log import GameLogWriter
+            # Starts the log here, so the workers don't both write its header
+            GameLogWriter(log).close()
+        players = game.players
+        results = SelfPlayResults((players[0].name, players[1].name))
+        batches = [seeds[n::workers] for n in range(workers)]
+        with ProcessPoolExecutor(workers) as pool:
+            for batch in pool.map(_play_games, [game] * workers, batches,
+                [log] * workers):
+                results.add(batch)
+    results.seconds = time.perf_counter() - start
+    return results
+
+
+if __name__ == '__main__':
+    from engine import DumbComputer, SmartComputer
+    from sim_nim import Pot
+    from ttt_engin import TicTacToeGrid
+
+    players = (SmartComputer('X'), DumbComputer('O'))
+    print(self_play(TicTacToeGrid(players=players), games=1000, seed=0),
+        end='\n\n')
+    players = (SmartComputer('A'), DumbComputer('B'))
+    print(self_play(Pot(13, players), games=1000, seed=0))
@@ -0,0 +1,335 @@
+"""A game server for many people playing the computer at once
+
+Clients connect over TCP and talk in lines of text. The server greets
+with the games it hosts:
+
+    HELLO ttt mnk nim
+
+and the client starts a game, with any options as key=value:
+
+    NEW ttt                      - the client moves first
+    NEW ttt first=ai             - the computer moves first
+    NEW nim count=13
+    NEW mnk width=4 height=4 k=3 time=0.2
+
+Then, until the game ends, the server sends the board as one line and
+asks for a move when it is the client's turn:
+
+    STATE <board>
+    TURN
+    MOVE <move>                  - from the client, such as A1 or 2
+    ERROR <reason>               - a move that can't be played
+    AI <move>                    - the move the computer made
+    END win|loss|tie             - from the client's side
+
+after which another NEW may follow. QUIT ends the session, and a
+session that sends nothing for idle_timeout seconds is sent
+END timeout and closed.
+
+The games, their options and their defaults are those of games.GAMES,
+as on the command line, and time=... is the seconds a timed computer
+thinks for each move.
+
+Searches run on a thread pool so the event loop keeps serving other
+sessions while the computer thinks. Each game gets its own computer
+player, since their tables aren't shared safely between threads.
+
+Run `python server.py serve` to start a server, and
+`python server.py load` to play many random games against it and
+report how long the server takes to answer each move.
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from engine import ComputerPlayer, GameState, Player
+from games import GAMES, PLAYERS, Game
+
+DEFAULT_PORT = 7878
+
+
+class SessionClosed(Exception):
+    """Raised when the client quits or disconnects"""
+
+
+class Session:
+    """One client connection"""
+
+    def __init__(self, reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter, idle_timeout: float) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+
+    def send(self, line: str) -> None:
+        self.writer.write(line.encode() + b'\n')
+
+    async def receive(self) -> str:
+        """Returns the next line from the client. Raises
+        asyncio.TimeoutError if it is idle for too long."""
+        await self.writer.drain()
+        line = await asyncio.wait_for(
+            self.reader.readline(), self.idle_timeout)
+        if not line:
+            raise SessionClosed
+        line = line.decode(errors='replace').strip()
+        if line.upper() == 'QUIT':
+            raise SessionClosed
+        return line
+
+
+class RemotePlayer(Player):
+    """A player whose moves come from a client of the server"""
+
+    def __init__(self, name: str = 'You', session: Session = None,
+        parse_move: Callable[[str], Any] = None) -> None:
+        super().__init__(name)
+        self.session = session
+        self.parse_move = parse_move
+
+    async def get_move_async(self, game: GameState):
+        self.session.send('TURN')
+        line = await self.session.receive()
+        command, _, entry = line.partition(' ')
+        try:
+            if command.upper() != 'MOVE':
+                raise ValueError('Expected MOVE <move> or QUIT')
+            move = self.parse_move(entry)
+            game.move(move)
+        except ValueError as error:
+            self.session.send(
+                f"ERROR {str(error) or 'That move is not allowed'}")
+            raise
+        return move
+
+
+async def play_async(game: GameState, executor: Executor = None,
+    on_move: Callable[[Player, Any, GameState], None] = None) -> GameState:
+    """Plays a game like engine.play_engine without blocking the event
+    loop, and returns the finished game. Players with a get_move_async
+    are awaited, and every other player is run on the executor."""
+    loop = asyncio.get_running_loop()
+    for player in game.players:
+        player.new_game(game)
+    while not game.won and not game.tie:
+        player = game.current_player
+        try:
+            if hasattr(player, 'get_move_async'):
+                move = await player.get_move_async(game)
+            elif isinstance(player, ComputerPlayer):
+                move = random.choice(await loop.run_in_executor(
+                    executor, player.inteligent_moves, game))
+            else:
+                move = await loop.run_in_executor(
+                    executor, player.get_move, game)
+            game = game.move(move)
+        except ValueError:
+            continue
+        if on_move is not None:
+            on_move(player, move, game)
+    return game
+
+
+# Every game in games.GAMES that can be played by hand
+HOSTED = tuple(
+    name for name, game in GAMES.items() if game.parse_move is not None)
+
+# The seconds a timed computer thinks for each move, unless time=... is
+# given
+THINKING_TIME = 0.2
+
+def game_type(name: str) -> Game:
+    if name not in HOSTED:
+        raise ValueError(f"Unknown game {name}, choose from "
+            f"{', '.join(HOSTED)}")
+    return GAMES[name]
+
+
+def _new_game(line: str, session: Session
+) -> Tuple[Game, GameState, RemotePlayer]:
+    """Starts the game asked for by a NEW line"""
+    words = line.split()
+    if len(words) < 2 or words[0].upper() != 'NEW':
+        raise ValueError('Expected NEW <game> [option=value ...] or QUIT')
+    name = words[1].lower()
+    kind = game_type(name)
+    options = {}
+    for word in words[2:]:
+        key, equals, value = word.partition('=')
+        if not equals:
+            raise ValueError(f'Options are given as key=value, not {word}')
+        options[key.lower()] = value
+    first = options.pop('first', 'you').lower()
+    if first not in ('you', 'ai'):
+        raise ValueError('first must be you or ai')
+    human = RemotePlayer(session=session, parse_move=kind.parse_move)
+    computer = PLAYERS[kind.computer]('AI', name,
+        float(options.pop('time', THINKING_TIME)))
+    players = (human, computer) if first == 'you' else (computer, human)
+    return kind, kind.new_game(players, options), human
+
+async def _serve_session(reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter, executor: Executor, idle_timeout: float
+) -> None:
+    session = Session(reader, writer, idle_timeout)
+    session.send(f"HELLO {' '.join(HOSTED)}")
+    try:
+        while True:
+            line = await session.receive()
+            try:
+                kind, game, human = _new_game(line, session)
+            except ValueError as error:
+                session.send(f'ERROR {error}')
+                continue
+
+            def report(player: Player, move, game: GameState) -> None:
+                if player is not human:
+                    session.send(f'AI {kind.format_move(move)}')
+                session.send(f'STATE {kind.render(game)}')
+
+            session.send(f'STATE {kind.render(game)}')
+            game = await play_async(game, executor, report)
+            score = game.score(human)
+            session.send(
+                f"END {'win' if score > 0 else 'loss' if score < 0 else 'tie'}")
+    except asyncio.TimeoutError:
+        session.send('END timeout')
+    except (SessionClosed, ConnectionError):
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+async def serve(host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+    idle_timeout: float = 60.0, threads: Optional[int] = None) -> None:
+    """Serves games until cancelled"""
+    with ThreadPoolExecutor(threads) as executor:
+        server = await asyncio.start_server(
+            lambda reader, writer: _serve_session(
+                reader, writer, executor, idle_timeout),
+            host, port, backlog=1024)
+        async with server:
+            print(f'Serving {", ".join(HOSTED)} on {host}:{port}')
+            await server.serve_forever()
+
+
+@dataclass
+class LoadResults:
+    """What a load test saw. Latencies are seconds from sending a move
+    to the server asking for the next one, or ending the game."""
+
+    latencies: List[float] = field(default_factory=list)
+    games: int = 0
+    errors: int = 0
+    outcomes: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    def percentile(self, percent: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1,
+            round(percent / 100 * (len(ordered) - 1)))]
+
+    def __str__(self) -> str:
+        outcomes = ', '.join(
+            f'{count} {outcome}' for outcome, count in self.outcomes.items())
+        return '\n'.join([
+            f'{self.games} games ({outcomes}), {self.errors} errors '
+            f'in {self.seconds:.2f}s',
+            f'{len(self.latencies)} moves, ms per move: '
+            + ', '.join(
+                f'p{percent} {self.percentile(percent) * 1000:.2f}'
+                for percent in (50, 90, 99)
+            )
+            + f', max {max(self.latencies, default=0) * 1000:.2f}',
+        ])
+
+
+async def _load_session(host: str, port: int, game: str, options: str,
+    games: int, results: LoadResults) -> None:
+    kind = game_type(game)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await reader.readline()
+        for _ in range(games):
+            first = random.choice(['', ' first=ai'])
+            writer.write(f'NEW {game}{first} {options}\n'.encode())
+            state = None
+            sent = None
+            while True:
+                reply = (await reader.readline()).decode().strip()
+                if not reply:
+                    raise ConnectionError('The server closed the session')
+                command, _, rest = reply.partition(' ')
+                if command == 'STATE':
+                    state = rest
+                elif command in ('TURN', 'END'):
+                    if sent is not None:
+                        results.latencies.append(time.perf_counter() - sent)
+                    if command == 'END':
+                        results.outcomes[rest] = (
+                            results.outcomes.get(rest, 0) + 1)
+                        results.games += 1
+                        break
+                    writer.write(f'MOVE {kind.random_move(state)}\n'.encode())
+                    sent = time.perf_counter()
+                elif command == 'ERROR':
+                    results.errors += 1
+                    break
+        writer.write(b'QUIT\n')
+    finally:
+        writer.close()
+
+async def load_test(host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+    game: str = 'ttt', options: str = '', sessions: int = 100,
+    games: int = 10) -> LoadResults:
+    """Plays random moves in many sessions at once, each playing games
+    in turn"""
+    results = LoadResults()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _load_session(host, port, game, options, games, results)
+        for _ in range(sessions)
+    ))
+    results.seconds = time.perf_counter() - start
+    return results
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_command = commands.add_parser('serve', help='run a server')
+    serve_command.add_argument('--idle-timeout', type=float, default=60.0)
+    serve_command.add_argument('--threads', type=int)
+    load_command = commands.add_parser('load',
+        help='load test a running server')
+    load_command.add_argument('--game', default='ttt', choices=HOSTED)
+    load_command.add_argument('--options', default='',
+        help='game options, such as "width=4 height=4 k=3"')
+    load_command.add_argument('--sessions', type=int, default=100)
+    load_command.add_argument('--games', type=int, default=10,
+        help='games played in each session')
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.idle_timeout,
+                args.threads))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(asyncio.run(load_test(args.host, args.port, args.game,
+            args.options, args.sessions, args.games)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,45 @@
-from dataclasses import dataclass
+from collections.abc import Callable
+from functools import cache
 import random
-from typing import List
-from engine import DumbComputer, GameState, Player, SmartComputer, play_engine
+from engine import (ByFields, ComputerPlayer, DumbComputer, GameState,
+    Player, SmartComputer, play_engine)
 
 
-@dataclass(frozen=True)
-class Pot(GameState):
-    """The pot in the game of Nim"""
+def check_takes(takes: tuple[int, ...]) -> None:
+    """Raises a ValueError unless takes holds at least one take, and
+    each takes at least one token"""
+    if not takes:
+        raise ValueError('There must be at least one take')
+    if min(takes) < 1:
+        raise ValueError('Each take must be of at least one token')
 
-    count: int
-    current_player: Player
+
+class Pot(GameState, ByFields):
+    """The pot in the game of Nim. Each turn takes one of takes tokens
+    from it, and whoever takes the last token loses. Raises a
+    ValueError for takes that check_takes doesn't allow."""
+
+    __slots__ = ('count', 'players', 'takes')
+
+    fields = __slots__
+
+    def __init__(self, count: int, players: tuple[Player, Player],
+        takes: tuple[int, ...] = (1, 2, 3)) -> None:
+        check_takes(takes)
+        self.count = count
+        self.players = players
+        self.takes = takes
 
     @property
-    def potential_moves(self) -> List:
-        return [1, 2, 3]
+    def potential_moves(self) -> list:
+        return list(self.takes)
+
+    def is_legal(self, take: int) -> bool:
+        return take in self.takes and take <= self.count
 
     def move(self, take: int) -> 'Pot':
-        if take <= self.count:
-            return Pot(self.count - take, self.current_player.opponent)
+        if self.is_legal(take):
+            return Pot(self.count - take, self.next_players, self.takes)
         else:
             raise ValueError
 
@@ -25,6 +47,17 @@ class Pot(GameState):
     def won(self):
         return self.count == 0
 
+    win_on_my_turn = True
+
+    @property
+    def winning_moves(self) -> tuple:
+        # Taking the last token hands the win to the other player
+        return ()
+
+    @property
+    def cache_key(self) -> tuple[int, tuple[int, ...]]:
+        return self.count, self.takes
+
     def score(self, player):
         if self.won:
             if player is self.current_player:
@@ -37,32 +70,260 @@ class Pot(GameState):
     def display(self) -> None:
         print(f"The pot now has {self.count} tokens")
 
-@dataclass(frozen=True)
+LOSS = 0
+WIN = 1
+DRAW = 2
+
+class PeriodicValues(ByFields):
+    """A value for every count of tokens, for a take set. values holds 
+    one byte for each count up to its length, after which its last 
+    period bytes repeat forever."""
+
+    __slots__ = ('takes', 'values', 'period')
+
+    fields = __slots__
+
+    def __init__(self, takes: tuple[int, ...], values: bytes,
+        period: int) -> None:
+        self.takes = takes
+        self.values = values
+        self.period = period
+
+    def __getitem__(self, count: int) -> int:
+        if count < len(self.values):
+            return self.values[count]
+        start = len(self.values) - self.period
+        return self.values[start + (count - start) % self.period]
+
+    def table(self, count: int) -> bytearray:
+        """The values of every count up to count, one byte each"""
+        table = bytearray(self.values[:count + 1])
+        if len(table) <= count:
+            repeat = self.values[len(self.values) - self.period:]
+            table += repeat * ((count + 1 - len(table)) // self.period + 1)
+            del table[count + 1:]
+        return table
+
+def _solve_periodic(takes: tuple[int, ...], empty: int,
+    value: Callable[[set[int]], int]) -> PeriodicValues:
+    """Finds the value of every count from the empty one up, given the 
+    value of the empty count and a rule for finding a count's value from 
+    the values of the counts its takes leave. A value only depends on 
+    the last max(takes) values, so as soon as those repeat a run seen 
+    before, every value after them repeats too."""
+    takes = tuple(sorted(set(takes)))
+    window = takes[-1]
+    values = bytearray([empty])
+    seen = {}
+    count = 0
+    while True:
+        count += 1
+        values.append(value(
+            {values[count - take] for take in takes if take <= count}))
+        if count >= window:
+            last = bytes(values[count + 1 - window:])
+            if last in seen:
+                return PeriodicValues(takes,
+                    bytes(values[:count + 1 - window]), count - seen[last])
+            seen[last] = count
+
+def _pot_value(results: set[int]) -> int:
+    if not results:
+        return DRAW
+    elif LOSS in results:
+        return WIN
+    elif DRAW in results:
+        return DRAW
+    else:
+        return LOSS
+
+@cache
+def solve_pot(takes: tuple[int, ...] = (1, 2, 3)) -> PeriodicValues:
+    """Whether every pot is a WIN, LOSS or DRAW for the player to move"""
+    return _solve_periodic(takes, WIN, _pot_value)
+
+
 class HumanNim(Player):
-    name: str = 'You'
+
+    def __init__(self, name: str = 'You') -> None:
+        super().__init__(name)
 
     def get_move(self, pot: Pot):
         address = 'Your' if self.name == 'You' else f"{self.name}'s"
-        take = int(input(f"{address} turn. Take 1, 2, or 3 tokens: "))
+        takes = [str(take) for take in sorted(pot.takes)]
+        if len(takes) > 2:
+            takes[-1] = f'or {takes[-1]}'
+            choices = ', '.join(takes)
+        else:
+            choices = ' or '.join(takes)
+        noun = 'token' if takes == ['1'] else 'tokens'
+        take = int(input(f"{address} turn. Take {choices} {noun}: "))
         if take in pot.potential_moves:
             return take
         else:
             raise ValueError
 
-@dataclass(frozen=True)
 class ComputerNimSmart(SmartComputer):
     def report_move(self, move) -> None:
         print(f"{self.name} take{'' if self.name == 'I' else 's'} {move}.",
          end=' ')
 
-@dataclass(frozen=True)
+class ComputerNimSolved(ComputerPlayer):
+    """Plays perfectly by looking up the pots each move leaves, so
+    pots of any size take the same time"""
+
+    def inteligent_moves(self, pot: Pot) -> list:
+        values = solve_pot(pot.takes)
+        moves = [take for take in pot.takes if take <= pot.count]
+        for result in (LOSS, DRAW):
+            best = [take for take in moves
+                if values[pot.count - take] == result]
+            if best:
+                return best
+        return moves
+
+    def report_move(self, move) -> None:
+        print(f"{self.name} take{'' if self.name == 'I' else 's'} {move}.",
+         end=' ')
+
 class ComputerNimDumb(DumbComputer):
     def report_move(self, move) -> None:
         print(f"{self.name} {'take' if self.name == 'I' else 'takes'} {move}.",
          end=' ')
 
+
+class Heaps(GameState, ByFields):
+    """Several heaps of tokens. Each turn takes one of takes tokens from
+    one heap, or any number of them when takes is None, and whoever 
+    makes the last move wins. A move is the index of a heap and the 
+    number of tokens to take from it. Raises a ValueError for takes 
+    that check_takes doesn't allow."""
+
+    __slots__ = ('counts', 'players', 'takes')
+
+    fields = __slots__
+
+    def __init__(self, counts: tuple[int, ...],
+        players: tuple[Player, Player],
+        takes: tuple[int, ...] | None = None) -> None:
+        if takes is not None:
+            check_takes(takes)
+        self.counts = counts
+        self.players = players
+        self.takes = takes
+
+    @property
+    def potential_moves(self) -> list[tuple[int, int]]:
+        return [
+            (heap, take)
+            for heap, count in enumerate(self.counts)
+            for take in (self.takes or range(1, count + 1))
+        ]
+
+    def is_legal(self, move: tuple[int, int]) -> bool:
+        heap, take = move
+        return (0 <= heap < len(self.counts)
+            and 0 < take <= self.counts[heap]
+            and (self.takes is None or take in self.takes))
+
+    def move(self, move: tuple[int, int]) -> 'Heaps':
+        if not self.is_legal(move):
+            raise ValueError
+        heap, take = move
+        counts = list(self.counts)
+        counts[heap] -= take
+        return Heaps(tuple(counts), self.next_players, self.takes)
+
+    @property
+    def smallest_take(self) -> int:
+        return min(self.takes) if self.takes else 1
+
+    @property
+    def won(self) -> bool:
+        return all(count < self.smallest_take for count in self.counts)
+
+    @property
+    def winning_moves(self) -> list[tuple[int, int]]:
+        smallest = self.smallest_take
+        left = [
+            heap for heap, count in enumerate(self.counts)
+            if count >= smallest
+        ]
+        if len(left) != 1:
+            return []
+        heap = left[0]
+        count = self.counts[heap]
+        return [
+            (heap, take)
+            for take in (self.takes or range(1, count + 1))
+            if smallest > count - take >= 0
+        ]
+
+    @property
+    def cache_key(self
+    ) -> tuple[tuple[int, ...], tuple[int, ...] | None]:
+        """The order of the heaps doesn't matter"""
+        return tuple(sorted(self.counts)), self.takes
+
+    def score(self, player):
+        if self.won:
+            if player is not self.current_player:
+                return 1
+            else:
+                return -1
+        elif self.tie:
+            return 0
+
+    def display(self) -> None:
+        for heap, count in enumerate(self.counts):
+            print(f"Heap {heap + 1}: {count} tokens")
+
+
+def _mex(results: set[int]) -> int:
+    """The least value not in results"""
+    value = 0
+    while value in results:
+        value += 1
+    return value
+
+@cache
+def grundy_values(takes: tuple[int, ...]) -> PeriodicValues:
+    """The Grundy number of a heap of every size, for a take set"""
+    return _solve_periodic(takes, 0, _mex)
+
+def grundy(count: int, takes: tuple[int, ...] | None) -> int:
+    if takes is None:
+        return count
+    return grundy_values(takes)[count]
+
+class ComputerNimGrundy(ComputerPlayer):
+    """Plays perfectly by the Sprague-Grundy theorem: a position is lost
+    for the player to move when the XOR of the Grundy numbers of its 
+    heaps is 0, so the winning moves leave a heap whose Grundy number 
+    makes it 0"""
+
+    def inteligent_moves(self, heaps: Heaps) -> list:
+        numbers = [grundy(count, heaps.takes) for count in heaps.counts]
+        total = 0
+        for number in numbers:
+            total ^= number
+        if not total:
+            return list(heaps.legal_moves)
+        moves = []
+        for heap, (count, number) in enumerate(zip(heaps.counts, numbers)):
+            target = number ^ total
+            if heaps.takes is None:
+                if target < count:
+                    moves.append((heap, count - target))
+                continue
+            for take in heaps.takes:
+                if (take <= count
+                    and grundy(count - take, heaps.takes) == target):
+                    moves.append((heap, take))
+        return moves
+
+
 if __name__ == '__main__':
     first = HumanNim()
-    second = ComputerNimSmart() 
-    players = (first, second)
-    play_engine(Pot(random.randint(6, 10), first), players)
+    second = ComputerNimSolved()
+    play_engine(Pot(random.randint(6, 10), (first, second)))
@@ -0,0 +1,154 @@
+"""A precomputed table of every reachable 3x3 tic-tac-toe position
+
+The table file holds a small header followed by one fixed size record
+for each of the 3**9 ways to fill the grid, found by reading the grid
+as a base 3 number with a blank as 0, X as 1 and O as 2. Each record
+is the minimax score for the player to move and a 9-bit mask of the
+moves that reach it. Positions that can't come up in play are marked
+UNREACHABLE.
+
+Build the table with python -m cli solve ttt, or by running this
+module, before any player uses it. Players memory-map the file
+read-only, so any number of processes share one copy of it.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, List, Tuple
+from engine import ComputerPlayer, GameState
+from ttt_engin import FULL_BOARD, WIN_MASKS, TicTacToeGrid
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    'ttt_solved.bin')
+MAGIC = b'TTT3'
+VERSION = 1
+HEADER = struct.Struct('<4sB3x')
+RECORD = struct.Struct('<bH')
+UNREACHABLE = -128
+POSITIONS = 3 ** 9
+
+_TERNARY = tuple(
+    sum(3 ** n for n in range(9) if mask >> n & 1)
+    for mask in range(1 << 9)
+)
+
+def index(x: int, o: int) -> int:
+    """The base 3 number of the position"""
+    return _TERNARY[x] + 2 * _TERNARY[o]
+
+
+def _has_line(board: int) -> bool:
+    return any(board & mask == mask for mask in WIN_MASKS)
+
+def solve() -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """Returns the score for the player to move and the mask of best
+    moves for every reachable position"""
+    solved = {}
+
+    def negamax(x: int, o: int) -> int:
+        if (x, o) in solved:
+            return solved[x, o][0]
+        x_to_move = x.bit_count() == o.bit_count()
+        blanks = FULL_BOARD & ~(x | o)
+        if _has_line(o if x_to_move else x):
+            value, best_moves = -(1 + blanks.bit_count()), 0
+        elif not blanks:
+            value, best_moves = 0, 0
+        else:
+            value, best_moves = None, 0
+            for square in range(9):
+                bit = 1 << square
+                if not blanks & bit:
+                    continue
+                if x_to_move:
+                    score = -negamax(x | bit, o)
+                else:
+                    score = -negamax(x, o | bit)
+                if value is None or score > value:
+                    value, best_moves = score, bit
+                elif score == value:
+                    best_moves |= bit
+        solved[x, o] = value, best_moves
+        return value
+
+    negamax(0, 0)
+    return solved
+
+def build(path: str = TABLE_PATH) -> int:
+    """Writes the table to path and returns the number of reachable
+    positions in it"""
+    records = bytearray(RECORD.pack(UNREACHABLE, 0) * POSITIONS)
+    solved = solve()
+    for (x, o), (value, best_moves) in solved.items():
+        RECORD.pack_into(records, index(x, o) * RECORD.size,
+            value, best_moves)
+    # Write beside the final file and rename, so that processes
+    # starting at the same time never map a half written table
+    partial = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(partial, 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION))
+        table_file.write(records)
+    os.replace(partial, path)
+    return len(solved)
+
+
+_tables: Dict[str, mmap.mmap] = {}
+_opening = threading.Lock()
+
+def open_table(path: str = TABLE_PATH) -> mmap.mmap:
+    """Memory-maps the table at path. Raises a ValueError if it hasn't
+    been built."""
+    if path in _tables:
+        return _tables[path]
+    with _opening:
+        if path in _tables:
+            return _tables[path]
+        if not os.path.exists(path):
+            raise ValueError(f'There is no solved table at {path}; build '
+                f'it with python -m cli solve ttt')
+        with open(path, 'rb') as table_file:
+            table = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(table)
+        if magic != MAGIC or version != VERSION:
+            table.close()
+            raise ValueError(f'{path} is not a version {VERSION} table')
+        _tables[path] = table
+        return table
+
+def lookup(grid: TicTacToeGrid, path: str = TABLE_PATH) -> Tuple[int, int]:
+    """Returns the score for the player to move and the mask of best
+    moves for the grid"""
+    value, best_moves = RECORD.unpack_from(open_table(path),
+        HEADER.size + index(grid.x, grid.o) * RECORD.size)
+    if value == UNREACHABLE:
+        raise ValueError('This position can not come up in play')
+    return value, best_moves
+
+
+class TableComputer(ComputerPlayer):
+    """Plays perfect 3x3 tic-tac-toe by looking moves up in the table,
+    which must have been built. Raises a ValueError as it is made if
+    it hasn't."""
+
+    fields = ('name', 'speed', 'table_path')
+
+    def __init__(self, name: str = 'I', speed: float = 0.0,
+        table_path: str = TABLE_PATH) -> None:
+        super().__init__(name, speed)
+        self.table_path = table_path
+        open_table(table_path)
+
+    def inteligent_moves(self, game: GameState) -> List:
+        value, best_moves = lookup(game, self.table_path)
+        return [
+            divmod(square, 3)
+            for square in range(9)
+            if best_moves >> square & 1
+        ]
+
+
+if __name__ == '__main__':
+    count = build()
+    print(f'Wrote {count} positions to {TABLE_PATH}')
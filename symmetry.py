@@ -0,0 +1,109 @@
+"""Symmetries of rectangular game boards
+
+Cells are numbered row by row, so the cell at (row, col) on a board
+with `cols` columns is number row * cols + col. A square board has 8
+symmetries (4 rotations, each optionally reflected), any other
+rectangle has 4. Transform 0 is always the identity.
+"""
+
+from functools import cache
+from collections.abc import Hashable, Sequence
+
+
+@cache
+def symmetries(rows: int, cols: int = None) -> tuple[tuple[int, ...], ...]:
+    """Returns each symmetry of the board as a tuple that gives, for
+    every cell, the cell it is moved to"""
+    cols = rows if cols is None else cols
+    last_row, last_col = rows - 1, cols - 1
+    maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (last_row - r, last_col - c),
+        lambda r, c: (last_row - r, c),
+        lambda r, c: (r, last_col - c),
+    ]
+    if rows == cols:
+        maps += [
+            lambda r, c: (c, last_row - r),
+            lambda r, c: (last_col - c, r),
+            lambda r, c: (c, r),
+            lambda r, c: (last_col - c, last_row - r),
+        ]
+    return tuple(
+        tuple(
+            row * cols + col
+            for row, col in (
+                transform(cell // cols, cell % cols)
+                for cell in range(rows * cols)
+            )
+        )
+        for transform in maps
+    )
+
+
+def transform_cells(cells: Sequence, transform: int,
+    rows: int, cols: int = None) -> tuple:
+    """Returns the contents of the board after the transform"""
+    moved = [None] * len(cells)
+    for cell, moved_to in enumerate(symmetries(rows, cols)[transform]):
+        moved[moved_to] = cells[cell]
+    return tuple(moved)
+
+def canonical(cells: Sequence[Hashable], rows: int, cols: int = None
+) -> tuple[tuple, int]:
+    """Returns the smallest of the symmetric forms of the board, and
+    the number of the transform that produces it"""
+    return min(
+        (transform_cells(cells, transform, rows, cols), transform)
+        for transform in range(len(symmetries(rows, cols)))
+    )
+
+
+@cache
+def _byte_tables(rows: int, cols: int = None) -> tuple:
+    """For each transform, one 256 entry table per byte of a bitboard,
+    giving where that byte's bits end up"""
+    tables = []
+    for perm in symmetries(rows, cols):
+        byte_tables = []
+        for start in range(0, len(perm), 8):
+            cells = perm[start:start + 8]
+            byte_tables.append(tuple(
+                sum(1 << moved_to
+                    for bit, moved_to in enumerate(cells)
+                    if byte >> bit & 1)
+                for byte in range(256)
+            ))
+        tables.append(tuple(byte_tables))
+    return tuple(tables)
+
+def transform_bits(board: int, transform: int,
+    rows: int, cols: int = None) -> int:
+    """Returns the bitboard after the transform"""
+    moved = 0
+    for table in _byte_tables(rows, cols)[transform]:
+        moved |= table[board & 0xFF]
+        board >>= 8
+    return moved
+
+def canonical_bits(boards: tuple[int, ...], rows: int, cols: int = None
+) -> tuple[tuple[int, ...], int]:
+    """Returns the smallest of the symmetric forms of a position held as
+    one bitboard per player, and the number of the transform that
+    produces it"""
+    best, best_transform = boards, 0
+    for transform, byte_tables in enumerate(_byte_tables(rows, cols)):
+        if not transform:
+            continue
+        moved = []
+        for board in boards:
+            bits = 0
+            for table in byte_tables:
+                bits |= table[board & 0xFF]
+                board >>= 8
+            moved.append(bits)
+        moved = tuple(moved)
+        if moved < best:
+            best, best_transform = moved, transform
+    return best, best_transform
+
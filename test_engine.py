@@ -0,0 +1,298 @@
+"""Tests of the game engine and its players
+
+Run with `python -m pytest`. The benchmarks in bench.py only measure;
+what they rely on being right is tested here.
+"""
+
+import ast
+from concurrent.futures import ThreadPoolExecutor
+import random
+import sys
+from time import perf_counter
+import pytest
+from deepening import DeepeningComputer
+from disk_cache import DiskCache
+from engine import DumbComputer, Player, SmartComputer
+from export import export, read_chunk
+from game_log import GameLogWriter, read_games
+from games import GAMES
+from mcts import MCTSComputer
+from mnk import MNKGrid, lines
+from search_cache import TranspositionTable
+from selfplay import play_headless
+from sim_nim import ComputerNimGrundy, Heaps, Pot
+from solved_table import TableComputer, build, solve
+from ttt_engin import TicTacToeGrid
+
+
+def test_games_on_threads_stay_apart(tmp_path):
+    """Plays 1,000 games side by side on a thread pool, a move at a time,
+    so the moves of different games interleave. Each game has its own
+    players and a result known in advance."""
+    random.seed(0)
+    table = str(tmp_path / 'ttt_solved.bin')
+    build(table)
+    games, expected = [], []
+    for n in range(1000):
+        names = (f'{n}a', f'{n}b')
+        if n % 3 == 0:
+            players = (TableComputer(names[0], table_path=table),
+                TableComputer(names[1], table_path=table))
+            games.append(TicTacToeGrid(players=players))
+            expected.append(None)
+        elif n % 3 == 1:
+            players = (DumbComputer(names[0]),
+                TableComputer(names[1], table_path=table))
+            games.append(TicTacToeGrid(players=players))
+            expected.append({None, players[1]})
+        else:
+            # Whoever is to move at a multiple of four, plus one, loses
+            players = (SmartComputer(names[0]), SmartComputer(names[1]))
+            games.append(Pot(n % 20 + 1, players))
+            expected.append(players[n % 20 % 4 == 0])
+    starts = list(games)
+    moves = [0] * len(games)
+
+    def play_move(n: int) -> None:
+        game = games[n]
+        games[n] = game.move(
+            random.choice(game.current_player.inteligent_moves(game)))
+        moves[n] += 1
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            playing = range(len(games))
+            while playing:
+                [*pool.map(play_move, playing)]
+                playing = [
+                    n for n in playing
+                    if not games[n].won and not games[n].tie
+                ]
+    finally:
+        sys.setswitchinterval(interval)
+
+    for start, game, want, count in zip(starts, games, expected, moves):
+        assert set(game.players) == set(start.players), 'players mixed'
+        assert all(
+            mine is theirs
+            for mine, theirs in zip(game.players,
+                start.players[::(-1) ** count])
+        ), 'turns out of order'
+        winner = max(game.players, key=game.score) if game.won else None
+        if isinstance(want, set):
+            assert winner in want, 'lost a won game'
+        else:
+            assert winner is want, 'wrong result'
+
+
+def test_mcts_without_time_to_search_still_moves():
+    players = (MCTSComputer('X', playouts=None, time_limit=0),
+        DumbComputer('O'))
+    winner, moves = play_headless(TicTacToeGrid(players=players))
+    assert moves >= 5
+
+def test_mcts_needs_playouts_or_a_time_limit():
+    with pytest.raises(ValueError):
+        MCTSComputer('X', playouts=None, time_limit=None)
+
+
+def test_deepening_keeps_to_its_time_limit():
+    """On a board far too big to search through, each move is chosen
+    within the time limit, allowing for a slow machine"""
+    players = (DeepeningComputer('X', time_limit=0.1),
+        DeepeningComputer('O', time_limit=0.1))
+    grid = MNKGrid(9, 9, 5, players=players, reach=1)
+    for _ in range(4):
+        start = perf_counter()
+        moves = grid.current_player.inteligent_moves(grid)
+        assert perf_counter() - start < 0.1 + 0.05
+        assert moves and all(grid.is_legal(move) for move in moves)
+        grid = grid.move(moves[0])
+
+
+def test_mnk_wins_match_a_full_scan():
+    """Random games on square and oblong boards, checking after every
+    move that the lines through the last move find a win exactly when
+    some line of the whole board is full"""
+    random.seed(0)
+    players = Player('X'), Player('O')
+    for width, height, k in ((3, 3, 3), (5, 4, 3), (4, 6, 4), (7, 5, 5)):
+        masks = lines(width, height, k)
+        for _ in range(50):
+            grid = MNKGrid(width, height, k, players=players)
+            while True:
+                assert grid.won == any(
+                    board & mask == mask
+                    for board in (grid.x, grid.o) for mask in masks)
+                if grid.won or grid.tie:
+                    break
+                grid = grid.move(random.choice(list(grid.legal_moves)))
+
+
+def test_tk_game_counts_match_a_rescan():
+    """Random games on boards of 3 to 5 squares a side, played twice
+    each to test clear_board, checking after every move that the win
+    and tie found from the counts kept are what scanning every combo of
+    the board finds"""
+    tk_tac_toe = pytest.importorskip('tk_tac_toe')
+    random.seed(0)
+    for size in (3, 4, 5):
+        game = tk_tac_toe.Game(board_size=size)
+        for _ in range(20):
+            game.clear_board()
+            blanks = [(row, col) for row in range(size)
+                for col in range(size)]
+            random.shuffle(blanks)
+            for row, col in blanks:
+                game.record(tk_tac_toe.Move(row, col,
+                    game.current_player.label))
+                labels = [
+                    {game._moves_matrix[r][c].label for r, c in combo}
+                    for combo in game._winning_combos
+                ]
+                assert game.win() == any(
+                    len(found) == 1 and None not in found
+                    for found in labels)
+                assert game.tie() == all(
+                    len(found - {None}) == 2 for found in labels)
+                if game.win() or game.tie():
+                    break
+                game.toggle_player()
+
+
+def _negamax(game, scores: dict) -> int:
+    """The score of game for the player to move, searched in full"""
+    key = game.x, game.o
+    if key not in scores:
+        if game.won or game.tie:
+            scores[key] = game.score(game.current_player)
+        else:
+            scores[key] = max(
+                -_negamax(game.move(move), scores)
+                for move in game.legal_moves)
+    return scores[key]
+
+def test_disk_cache_restarts_warm_and_matches_negamax(tmp_path):
+    """Chooses moves in positions partway through 4x3 games with a
+    table backed by a DiskCache, then again with a new table on the
+    same file, as a restarted process would. Both choose the moves a
+    plain negamax finds best, and the second finds its positions on
+    disk. A new version of the cache starts empty."""
+    random.seed(0)
+    path = str(tmp_path / 'cache.db')
+    lines_of_play = []
+    while len(lines_of_play) < 5:
+        grid = MNKGrid(4, 3, 3, players=(Player('X'), Player('O')))
+        moves = random.sample(list(grid.legal_moves), 4)
+        for move in moves:
+            grid = grid.move(move)
+        if not grid.won:
+            lines_of_play.append(moves)
+    misses = {}
+    for run in ('cold', 'warm'):
+        with DiskCache(path, 'mnk_4_3_3') as disk:
+            player = SmartComputer('X', table=TranspositionTable(
+                backend=disk))
+            players = player, SmartComputer('O')
+            for moves in lines_of_play:
+                grid = MNKGrid(4, 3, 3, players=players)
+                for move in moves:
+                    grid = grid.move(move)
+                scores = {}
+                best = max(-_negamax(grid.move(move), scores)
+                    for move in grid.legal_moves)
+                assert sorted(player.inteligent_moves(grid)) == sorted(
+                    move for move in grid.legal_moves
+                    if -_negamax(grid.move(move), scores) == best)
+            misses[run] = player.table.misses
+    assert misses['cold'] > 0 and misses['warm'] == 0
+    with DiskCache(path, 'mnk_4_3_3', version='2') as disk:
+        assert len(disk) == 0
+
+
+def test_export_reads_back_as_the_solved_table(tmp_path):
+    """Exports every 3x3 position in chunks of 1,000, merging small
+    sort runs, checks the .npy header and size of each file, and reads
+    the records back with read_chunk to compare with solved_table"""
+    paths = export(TicTacToeGrid(), str(tmp_path), chunk_size=1000,
+        sort_size=256)
+    assert len(paths) > 1
+    records = []
+    for path in paths:
+        with open(path, 'rb') as chunk:
+            data = chunk.read()
+        assert data[:8] == b'\x93NUMPY\x01\x00'
+        length = int.from_bytes(data[8:10], 'little')
+        assert (10 + length) % 64 == 0
+        header = ast.literal_eval(data[10:10 + length].decode('latin1'))
+        assert header['descr'] == [('planes', '|u1', (2, 3, 3)),
+            ('value', '|i1'), ('moves', '|u1', (9,))]
+        assert header['fortran_order'] is False
+        chunk_records = list(read_chunk(path))
+        assert header['shape'] == (len(chunk_records),)
+        assert len(data) == 10 + length + 28 * len(chunk_records)
+        records += chunk_records
+    solved = solve()
+    assert len(records) == len(solved)
+    assert {
+        (x, o): (value, best) for x, o, value, best in records
+    } == solved
+
+
+def test_grundy_player_matches_minimax():
+    """On every position of up to three small heaps, for several take
+    sets, with one SmartComputer reused across all of them, so that a
+    cache key that left out the takes would give wrong moves"""
+    smart, other = SmartComputer('S'), SmartComputer('T')
+    grundy_player = ComputerNimGrundy('G')
+    for takes in (None, (1, 2, 3), (1, 3), (1, 3, 4), (2, 5)):
+        for counts in (
+            (a, b, c) for a in range(6) for b in range(a, 6)
+            for c in range(b, 6)):
+            heaps = Heaps(counts, (smart, other), takes)
+            if heaps.won or heaps.tie:
+                continue
+            grundy_heaps = Heaps(counts, (grundy_player, other), takes)
+            assert (sorted(smart.inteligent_moves(heaps))
+                == sorted(grundy_player.inteligent_moves(grundy_heaps))), (
+                f'{counts} with takes {takes}')
+
+def test_one_engine_across_take_sets():
+    smart, other = SmartComputer('S'), SmartComputer('T')
+    smart.inteligent_moves(Heaps((0, 0, 3), (smart, other), (1, 2, 3)))
+    moves = smart.inteligent_moves(Heaps((0, 0, 3), (smart, other), (1, 3)))
+    assert sorted(moves) == [(2, 1), (2, 3)]
+
+
+def test_every_game_logs_and_replays(tmp_path):
+    """Plays each game in games.GAMES from its defaults, logs it and
+    rebuilds its states from the log"""
+    random.seed(0)
+    path = str(tmp_path / 'games.log')
+    played = []
+    with GameLogWriter(path) as log:
+        for name, entry in GAMES.items():
+            players = Player(entry.names[0]), Player(entry.names[1])
+            game = entry.new_game(players, {'width': '4', 'height': '4'})
+            log.start(game)
+            states = [game]
+            while not game.won and not game.tie:
+                move = random.choice(list(game.legal_moves))
+                game = game.move(move)
+                log.on_move(game.players[1], move, game)
+                states.append(game)
+            played.append((name, states))
+    records = list(read_games(path))
+    assert [record.game_type for record in records] == list(GAMES)
+    for record, (name, states) in zip(records, played):
+        assert list(record.states()) == states
+
+
+
+def test_log_refuses_a_game_partway(tmp_path):
+    players = Player('X'), Player('O')
+    with GameLogWriter(str(tmp_path / 'games.log')) as log:
+        with pytest.raises(ValueError):
+            log.start(TicTacToeGrid(players=players).move((1, 1)))
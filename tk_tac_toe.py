@@ -29,8 +29,25 @@ class Game:
         ]
         self.board_size = board_size
         self._winning_combos = self._get_winning_combos()
+        self._combos_through = [
+            [[] for col in range(board_size)]
+            for row in range(board_size)
+        ]
+        for number, combo in enumerate(self._winning_combos):
+            for row, col in combo:
+                self._combos_through[row][col].append(number)
+        self._labels = [player.label for player in players]
+        self._reset_counts()
         self.toggle_player()
 
+    def _reset_counts(self) -> None:
+        """Starts counting each player's moves in each winning combo"""
+        self._combo_counts = {
+            label: [0] * len(self._winning_combos) for label in self._labels
+        }
+        self._blocked_combos = 0
+        self.winner_combo = None
+
     def _get_winning_combos(self) -> list:
         rows = [
             [(move.row, move.col) for move in row]
@@ -51,34 +68,25 @@ class Game:
 
     def record(self, move: Move) -> None:
         self._moves_matrix[move.row][move.col] = move
+        counts = self._combo_counts[move.label]
+        for combo in self._combos_through[move.row][move.col]:
+            counts[combo] += 1
+            if counts[combo] == 1 and any(
+                other[combo] for label, other in self._combo_counts.items()
+                if label != move.label):
+                self._blocked_combos += 1
+            if counts[combo] == self.board_size and not self.win():
+                self.winner_combo = self._winning_combos[combo]
 
     def win(self) -> bool:
         """Returns True is there is a winning combonation, 
         otherwise returns False"""
-        for combo in self._winning_combos:
-            in_combo = {
-                self._moves_matrix[row][col].label
-                for row, col in combo
-            }
-            if len(in_combo) == 1 and None not in in_combo:
-                self.winner_combo = combo
-                return True
-        return False
+        return self.winner_combo is not None
 
     def tie(self) -> bool:
         """Returns True if all winning combonations have been blocked,
         otherwise returns False"""
-        blocked_combo = []
-        for combo in self._winning_combos:
-            if len({
-                self._moves_matrix[row][col].label
-                for row, col in combo
-                if self._moves_matrix[row][col].label is not None
-            }) == 2:
-                blocked_combo.append(True)
-            else:
-                blocked_combo.append(False)
-        return all(blocked_combo)
+        return self._blocked_combos == len(self._winning_combos)
 
     def toggle_player(self) -> None:
         self.current_player = next(self._turn_generator)
@@ -87,6 +95,7 @@ class Game:
         for row_num, row in enumerate(self._moves_matrix):
             for col_num in range(len(row)):
                 row[col_num] = Move(row_num, col_num)
+        self._reset_counts()
 
 
 class Board(tk.Tk):
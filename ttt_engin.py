@@ -1,11 +1,11 @@
-from dataclasses import dataclass
-from functools import cached_property
 import re
-import textwrap
-from typing import List, Tuple
+from collections.abc import Iterator
 from engine import (GameState, Player,
     play_engine,
     SmartComputer, ComputerPlayer)
+from deepening import line_balance
+from symmetry import canonical_bits
+from zobrist import board_keys, smallest_key
 
 
 TicTacToe_WINNING_COMBOS = (
@@ -15,48 +15,187 @@ TicTacToe_WINNING_COMBOS = (
     [[(n, 2-n) for n in (0, 1, 2)]]
 )
 
-@dataclass(frozen=True)
+WIN_MASKS = tuple(
+    sum(1 << (row * 3 + col) for row, col in combo)
+    for combo in TicTacToe_WINNING_COMBOS
+)
+FULL_BOARD = (1 << 9) - 1
+SQUARES = tuple((row, col) for row in range(3) for col in range(3))
+SQUARE_PRIORITY = (1, 0, 1,
+                   0, 2, 0,
+                   1, 0, 1)
+
 class TicTacToeGrid(GameState):
-    matrix: str = ' ' * 9
-    current_player: Player = None
-    
+    """A 3x3 grid stored as two 9-bit boards, one for each mark.
+    Bit (row * 3 + col) is set when that square holds the mark.
+
+    Whether the grid is won and its hash are worked out as it is made, 
+    and kept in slots along with its cache_key once that is asked for. 
+    With at most nine marks, the Zobrist keys of the grid's rotations 
+    and reflections are cheap to work out from the boards then, rather 
+    than carried by every grid as mnk.MNKGrid carries its own.
+
+    Grids are equal when their boards and players are, and their slots
+    are not to change once made."""
+
+    __slots__ = ('x', 'o', 'players', 'won', '_hash', '_cache_key')
+
+    def __init__(self, x: int = 0, o: int = 0,
+        players: tuple[Player, Player] = ()) -> None:
+        self.x = x
+        self.o = o
+        self.players = players
+        self.won = self._find_win()
+        self._hash = x | o << 9
+        self._cache_key = None
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self.x == other.x and self.o == other.o
+            and self.players == other.players)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return (f'{type(self).__name__}(x={self.x!r}, o={self.o!r}, '
+            f'players={self.players!r})')
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.x, self.o, self.players)
+
+    @classmethod
+    def from_matrix(cls, matrix: str, players: tuple[Player, Player] = ()
+    ) -> 'TicTacToeGrid':
+        x = sum(1 << n for n, mark in enumerate(matrix) if mark == 'X')
+        o = sum(1 << n for n, mark in enumerate(matrix) if mark == 'O')
+        return cls(x, o, players)
+
     @property
-    def potential_moves(self) -> List:
+    def matrix(self) -> str:
+        return ''.join(
+            'X' if self.x >> n & 1 else 'O' if self.o >> n & 1 else ' '
+            for n in range(9)
+        )
+
+    @property
+    def potential_moves(self) -> list:
         return [(row, col) for row in range(3) for col in range(3)]
 
-    def move(self, position: Tuple[int,int]) -> 'TicTacToeGrid':
+    def move(self, position: tuple[int,int]) -> 'TicTacToeGrid':
         row, col = position
-        index = row * 3 + col
-        if self.matrix[index] == ' ':
-            x_count = self.matrix.count('X')
-            o_count = self.matrix.count('O')
-            mark = ('X' if x_count == o_count else 'O')
-            new_matrix = self.matrix[:index] + mark + self.matrix[index + 1:]
-            return TicTacToeGrid(new_matrix, self.current_player.opponent)
-        else:
+        if not (0 <= row < 3 and 0 <= col < 3):
             raise ValueError
+        bit = 1 << (row * 3 + col)
+        if (self.x | self.o) & bit:
+            raise ValueError
+        if self.x.bit_count() == self.o.bit_count():
+            return TicTacToeGrid(self.x | bit, self.o, self.next_players)
+        else:
+            return TicTacToeGrid(self.x, self.o | bit, self.next_players)
 
-    @cached_property
-    def won(self) -> bool:
-        for combo in TicTacToe_WINNING_COMBOS:
-            if (self.matrix[combo[0][0] * 3 + combo[0][1]]
-             == self.matrix[combo[1][0] * 3 + combo[1][1]]
-             == self.matrix[combo[2][0] * 3 + combo[2][1]]
-             != ' '):
+    @property
+    def children(self) -> Iterator[tuple[tuple[int, int], 'TicTacToeGrid']]:
+        """Yields each blank square, in the order of potential_moves, with
+        the grid after a move there, skipping the checks move makes"""
+        x, o = self.x, self.o
+        players = self.next_players
+        x_to_move = x.bit_count() == o.bit_count()
+        taken = x | o
+        for square, position in enumerate(SQUARES):
+            bit = 1 << square
+            if taken & bit:
+                continue
+            if x_to_move:
+                yield position, TicTacToeGrid(x | bit, o, players)
+            else:
+                yield position, TicTacToeGrid(x, o | bit, players)
+
+    def is_legal(self, position: tuple[int, int]) -> bool:
+        row, col = position
+        return (0 <= row < 3 and 0 <= col < 3
+            and not (self.x | self.o) >> (row * 3 + col) & 1)
+
+    def _find_win(self) -> bool:
+        # Only the player who just moved can have completed a line
+        if self.x.bit_count() > self.o.bit_count():
+            last = self.x
+        else:
+            last = self.o
+        for mask in WIN_MASKS:
+            if last & mask == mask:
                 return True
         return False
 
+    def _completing_moves(self, mine: int, theirs: int
+    ) -> set[tuple[int, int]]:
+        """The squares that finish a line for the player with the 
+        marks in theirs"""
+        moves = set()
+        for mask in WIN_MASKS:
+            if (theirs & mask).bit_count() == 2 and not mine & mask:
+                moves.add(divmod((mask & ~theirs).bit_length() - 1, 3))
+        return moves
+
+    @property
+    def winning_moves(self) -> set[tuple[int, int]]:
+        if self.x.bit_count() == self.o.bit_count():
+            return self._completing_moves(self.o, self.x)
+        else:
+            return self._completing_moves(self.x, self.o)
+
+    @property
+    def threat_moves(self) -> set[tuple[int, int]]:
+        if self.x.bit_count() == self.o.bit_count():
+            return self._completing_moves(self.x, self.o)
+        else:
+            return self._completing_moves(self.o, self.x)
+
+    def static_priority(self, position: tuple[int, int]) -> int:
+        """The center is worth most, then the corners, then the edges"""
+        return SQUARE_PRIORITY[position[0] * 3 + position[1]]
+
+    @property
+    def cache_key(self) -> int:
+        """The smallest Zobrist key of the grid's rotations and 
+        reflections"""
+        if self._cache_key is None:
+            self._cache_key = smallest_key(board_keys((self.x, self.o), 3))
+        return self._cache_key
+
+    @property
+    def exact_key(self) -> tuple[int, int]:
+        """The boards of whichever rotation or reflection of the grid 
+        sorts first"""
+        return canonical_bits((self.x, self.o), 3)[0]
+
+    @property
+    def blanks(self) -> int:
+        return 9 - (self.x | self.o).bit_count()
+
     def score(self, player):
         if self.won:
             if player is not self.current_player:
-                return 1 + self.matrix.count(' ')
+                return 1 + self.blanks
             else:
-                return -(1 + self.matrix.count(' '))
+                return -(1 + self.blanks)
         elif self.tie:
             return 0
-            
+
+    def evaluate(self, player) -> float:
+        if self.x.bit_count() == self.o.bit_count():
+            to_move, other = self.x, self.o
+        else:
+            to_move, other = self.o, self.x
+        if player is self.current_player:
+            return line_balance(to_move, other, WIN_MASKS, 3)
+        else:
+            return line_balance(other, to_move, WIN_MASKS, 3)
     
     def display(self) -> None:
+        import textwrap
+
         print('\033c', end='')
         print(
             textwrap.dedent(
@@ -72,67 +211,42 @@ class TicTacToeGrid(GameState):
             ).format(*self.matrix)
         )
 
-@dataclass(frozen=True)
+def parse_position(entry: str) -> tuple[int, int]:
+    """Reads a square written as A1 or 1A, as (row, col)"""
+    entry = entry.strip()
+    if re.fullmatch('[abcABC][123]', entry):
+        col, row = entry
+    elif re.fullmatch('[123][abcABC]', entry):
+        row, col = entry
+    else:
+        raise ValueError('Specify your move in the form of A1 or 1A')
+    row = int(row) - 1
+    col = ord(col.upper()) - ord('A')
+    return row, col
+
+def format_position(position: tuple[int, int]) -> str:
+    row, col = position
+    return f"{'ABC'[col]}{row + 1}"
+
 class HumanTTT(Player):
 
-    def get_move(self, grid: TicTacToeGrid) -> Tuple[int, int]:
-        entry = input(f'Your turn, {self.name}:').strip()
-        if re.match('[abcABC][123]', entry):
-            col, row = entry
-        elif re.match('[123][abcABC]', entry):
-            row, col = entry
-        else:
-            print('Specify your move in the form of A1 or 1A')
-            raise ValueError
-        row = int(row) - 1
-        col = ord(col.upper()) - ord('A')
-        return row, col
+    def get_move(self, grid: TicTacToeGrid) -> tuple[int, int]:
+        try:
+            return parse_position(input(f'Your turn, {self.name}:'))
+        except ValueError as error:
+            print(error)
+            raise
 
-    @property
-    def opponent(self) -> 'Player':
-        player_list = [*reversed(players)]
-        for n, player in enumerate(player_list):
-            if player is self:
-                return player_list[n-1]
-        raise ValueError('This player is not in the Players list')
-
-@dataclass(frozen=True)
 class PuncuatedComputer(SmartComputer):
-    def inteligent_moves(self, game: GameState) -> List:
-        move_index = [
-            (move, self.minimax(next_state, my_turn=False))
-            for move, next_state in game.possible_moves
-        ]
+    def inteligent_moves(self, game: GameState) -> list:
+        good_moves = super().inteligent_moves(game)
         if input() == 'b': breakpoint()
-        best_option_score = max(score for move, score in move_index)
-        good_moves = [
-            move
-            for move, score in move_index
-            if score == best_option_score
-        ]
         return good_moves
 
-    @property
-    def opponent(self) -> 'Player':
-        player_list = [*reversed(players)]
-        for n, player in enumerate(player_list):
-            if player is self:
-                return player_list[n-1]
-        raise ValueError('This player is not in the Players list')
-
-@dataclass(frozen=True)
 class DumbComputer(ComputerPlayer):
-    def inteligent_moves(self, game: GameState) -> List:
-        return [move for move, state in game.possible_moves]
-
-    @property
-    def opponent(self) -> 'Player':
-        player_list = [*reversed(players)]
-        for n, player in enumerate(player_list):
-            if player is self:
-                return player_list[n-1]
-        raise ValueError('This player is not in the Players list')
+    def inteligent_moves(self, game: GameState) -> list:
+        return list(game.legal_moves)
 
 if __name__ == '__main__':
     players = (DumbComputer('X', speed=.1), PuncuatedComputer('O'))
-    play_engine(TicTacToeGrid(current_player=players[0]), players)
\ No newline at end of file
+    play_engine(TicTacToeGrid(players=players))
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""Zobrist keys: position keys that can be updated as moves are made
+
+Each mark on each square of a board is given a random 64-bit number,
+and the key of a position is the XOR of the numbers of the marks on
+it. Making a move XORs in one more number, so the key of a child costs
+the same however big the board is, rather than growing with its area.
+
+So that reflections of a board share a key, a key is kept for each
+symmetry of the board, as if every move had been made on the board
+after that transform, and the smallest of them is used. The keys are
+packed side by side into one int, so a move updates them all with a
+single XOR.
+
+mnk.MNKGrid carries its packed keys and updates them as each move is
+made. ttt_engin.TicTacToeGrid doesn't: with at most nine marks, it
+works its keys out with board_keys from the whole board, only once its
+cache_key is asked for.
+
+Different positions can have the same key, if rarely. Tables in debug
+mode check for this; see search_cache.TranspositionTable.
+"""
+
+from functools import cache
+import random
+from collections.abc import Sequence
+from symmetry import symmetries
+
+KEY_BITS = 64
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+@cache
+def square_keys(rows: int, cols: int = None, marks: int = 2, game: str = ''
+) -> tuple[tuple[int, ...], ...]:
+    """A random number for each mark on each square. They are the same
+    in every process, for caches kept on disk, and differ between games
+    played on boards of the same size."""
+    cols = rows if cols is None else cols
+    generator = random.Random(f'{game}:{rows}x{cols}:{marks}')
+    return tuple(
+        tuple(generator.getrandbits(KEY_BITS) for _ in range(marks))
+        for _ in range(rows * cols)
+    )
+
+@cache
+def symmetric_keys(rows: int, cols: int = None, marks: int = 2,
+    game: str = '') -> tuple[tuple[int, ...], ...]:
+    """For each square and mark, the packed numbers of the mark under
+    each transform of the board"""
+    keys = square_keys(rows, cols, marks, game)
+    perms = symmetries(rows, cols)
+    return tuple(
+        tuple(
+            sum(keys[perm[square]][mark] << KEY_BITS * transform
+                for transform, perm in enumerate(perms))
+            for mark in range(marks)
+        )
+        for square in range(len(keys))
+    )
+
+
+def board_keys(boards: Sequence[int], rows: int, cols: int = None,
+    game: str = '') -> int:
+    """The packed keys of a position given as one bitboard for each
+    mark"""
+    tables = symmetric_keys(rows, cols, len(boards), game)
+    keys = 0
+    for mark, board in enumerate(boards):
+        while board:
+            square = (board & -board).bit_length() - 1
+            keys ^= tables[square][mark]
+            board &= board - 1
+    return keys
+
+def smallest_key(keys: int, transforms: int = 8) -> int:
+    """The smallest of the packed keys of a board with that many
+    transforms"""
+    return min([
+        keys >> shift & KEY_MASK
+        for shift in range(0, KEY_BITS * transforms, KEY_BITS)
+    ])